@@ -0,0 +1,182 @@
+"""
+Fake Anthropic Messages API server for load testing.
+It answers ``POST /v1/messages`` like the Anthropic API, after a configurable
+latency, so the application can be driven without calling the real service:
+- Visualization requests get a matplotlib histogram of the first numeric column
+- Image requests get a short list of markdown insights
+- Streaming requests (``"stream": true``) get server-sent events, one per token
+
+Point the application at it with the ``ANTHROPIC_BASE_URL`` environment
+variable::
+
+    python benchmarks/fake_llm_server.py --port 8765 --latency 0.5
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 streamlit run src/data_viz/main.py
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+VISUALIZATION_RESPONSE = """```python
+import matplotlib.pyplot as plt
+df.select_dtypes("number").iloc[:, 0].plot(kind="hist", bins=30)
+plt.show()
+```"""
+
+INSIGHTS_RESPONSE = """- **Distribution**: most values are concentrated around the center.
+- **Outliers**: a few values lie far from the rest of the data."""
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering Anthropic Messages API requests.
+
+    Attributes:
+        latency (float): Seconds waited before the first token of every response.
+        token_delay (float): Seconds waited between two streamed tokens, and per
+            token before a non-streamed response is returned.
+        requests (int): Number of requests served.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.5, token_delay=0.0):
+        super().__init__(address, _MessagesHandler)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """Base URL to use as ``ANTHROPIC_BASE_URL``."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Serve requests on a background thread.
+
+        Returns:
+            FakeLLMServer: The server, to chain with the constructor.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+
+class _MessagesHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_POST(self):
+        if not self.path.startswith("/v1/messages"):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.count_request()
+
+        content = body["messages"][-1]["content"]
+        has_image = isinstance(content, list) and any(
+            block.get("type") == "image" for block in content
+        )
+        text = INSIGHTS_RESPONSE if has_image else VISUALIZATION_RESPONSE
+        tokens = text.split(" ")
+
+        time.sleep(self.server.latency)
+        if body.get("stream"):
+            self._stream(body["model"], tokens)
+        else:
+            time.sleep(self.server.token_delay * len(tokens))
+            self._send_json(200, _message(body["model"], text, len(tokens)))
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        message = _message(model, "", 0)
+        message["content"] = []
+        self._event("message_start", {"type": "message_start", "message": message})
+        self._event(
+            "content_block_start",
+            {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        )
+        for index, token in enumerate(tokens):
+            text = token if index == 0 else f" {token}"
+            self._event(
+                "content_block_delta",
+                {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}},
+            )
+            time.sleep(self.server.token_delay)
+        self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._event(
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": len(tokens)},
+            },
+        )
+        self._event("message_stop", {"type": "message_stop"})
+
+    def _event(self, name, payload):
+        self.wfile.write(f"event: {name}\ndata: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+
+def _message(model, text, output_tokens):
+    return {
+        "id": f"msg_{uuid.uuid4().hex}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 0, "output_tokens": output_tokens},
+    }
+
+
+def main(argv=None):
+    """
+    Command line entry point serving the fake API until interrupted.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description="Serve a fake Anthropic Messages API.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token.")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between tokens.")
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(("127.0.0.1", args.port), args.latency, args.token_delay)
+    print(f"Fake Anthropic API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
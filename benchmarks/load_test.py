@@ -0,0 +1,257 @@
+"""
+Concurrent-session load test of the AI-Powered Data Visualization application.
+Simulated users drive ``main.main`` through Streamlit's headless app testing
+tools, against a local fake Anthropic API, and go through the whole flow:
+- Open the app and navigate to the Data Visualization page
+- Enter an API key, which loads the uploaded dataset
+- Clean the dataset
+- Generate a visualization
+- Analyze the rendered chart
+
+For each number of concurrent sessions, the p50/p95/p99 latency of the page
+reruns, the throughput and the resident memory per session are reported::
+
+    python benchmarks/load_test.py data.csv --sessions 1 5 10 20 --latency 0.5
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner import magic
+from streamlit.testing.v1 import AppTest
+
+from fake_llm_server import FakeLLMServer
+
+logger = logging.getLogger(__name__)
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src" / "data_viz"
+
+STEPS = ("load", "navigate", "api_key", "clean", "generate", "analyze")
+
+
+def session_app(src_dir, dataset_path):
+    """
+    Streamlit script of a simulated session: the app with a dataset uploaded.
+
+    The CSV uploader is replaced by one that always returns ``dataset_path``,
+    since uploads cannot be simulated consistently across Streamlit versions.
+    """
+    import sys
+    from io import BytesIO
+    from pathlib import Path
+
+    import streamlit as st
+
+    if src_dir not in sys.path:
+        sys.path.insert(0, src_dir)
+
+    class Upload(BytesIO):
+        def __init__(self, path):
+            super().__init__(Path(path).read_bytes())
+            self.name = Path(path).name
+            self.file_id = self.name
+
+    def file_uploader(label, type=None, accept_multiple_files=False, **kwargs):
+        if not type or "csv" not in type:
+            return [] if accept_multiple_files else None
+        return [Upload(dataset_path)] if accept_multiple_files else Upload(dataset_path)
+
+    st.file_uploader = file_uploader
+
+    from main import main
+
+    main()
+
+
+@contextmanager
+def shared_runtime():
+    """
+    Share the runtime of a Streamlit server between the simulated sessions.
+
+    Each ``AppTest`` run installs its own mock runtime as the process-wide
+    singleton and removes it when the run ends, which breaks the runs of the
+    other sessions still in flight. Each run also compiles the script again,
+    where a server compiles it once, and concurrent compilations can fail on
+    Python 3.11, so compilation is serialized.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+
+    compile_lock = threading.Lock()
+    add_magic = magic.add_magic
+
+    def locked_add_magic(code, script_path):
+        with compile_lock:
+            return add_magic(code, script_path)
+
+    with patch.object(Runtime, "instance", lambda: runtime), patch.object(
+        Runtime, "exists", lambda: True
+    ), patch.object(magic, "add_magic", locked_add_magic):
+        yield runtime
+
+
+def rss_bytes():
+    """Return the resident set size of this process, or its peak where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _button(at, label):
+    for button in at.button:
+        if label in button.label:
+            return button
+    raise LookupError(
+        f"No '{label}' button among {[button.label for button in at.button]}, "
+        f"errors: {[error.value for error in at.error]}, warnings: {[warning.value for warning in at.warning]}"
+    )
+
+
+def run_session(dataset_path, timeout):
+    """
+    Drive one simulated session through the whole flow.
+
+    Args:
+        dataset_path (str): Path of the CSV file uploaded by the session.
+        timeout (float): Seconds a single rerun may take.
+
+    Returns:
+        tuple[AppTest, dict]: The session, kept alive for memory measurement,
+        and the latency of each step in seconds.
+    """
+    at = AppTest.from_function(
+        session_app, args=(str(SRC_DIR), str(dataset_path)), default_timeout=timeout
+    )
+    actions = {
+        "load": lambda: at.run(),
+        "navigate": lambda: at.sidebar.selectbox[0].set_value("Data Visualization").run(),
+        "api_key": lambda: at.text_input[0].input("sk-load-test").run(),
+        "clean": lambda: _button(at, "Clean Data").click().run(),
+        "generate": lambda: (
+            at.text_area[0].input("Show the distribution of the first numeric column"),
+            _button(at, "Generate Visualization").click().run(),
+        ),
+        "analyze": lambda: _button(at, "Analyze this chart").click().run(),
+    }
+
+    latencies = {}
+    for step in STEPS:
+        start = time.perf_counter()
+        actions[step]()
+        latencies[step] = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"Session failed at step '{step}': {at.exception[0].value}")
+    return at, latencies
+
+
+def run_load(dataset_path, sessions, timeout):
+    """
+    Run concurrent sessions and measure latency, throughput and memory.
+
+    Args:
+        dataset_path (str): Path of the CSV file uploaded by every session.
+        sessions (int): Number of concurrent sessions.
+        timeout (float): Seconds a single rerun may take.
+
+    Returns:
+        dict: Latency percentiles in milliseconds, overall and per step, of
+        the sessions that completed, throughput in reruns per second, memory
+        per session in MiB and number of failed sessions.
+    """
+
+    def attempt(_):
+        try:
+            return run_session(dataset_path, timeout)
+        except Exception as e:
+            logger.warning(f"Session failed: {e}")
+            return None
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    with shared_runtime(), ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = list(executor.map(attempt, range(sessions)))
+    elapsed = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    latencies = [result[1] for result in results if result is not None]
+    all_latencies = [value for session in latencies for value in session.values()]
+
+    def percentiles(values):
+        if not values:
+            return {"p50": None, "p95": None, "p99": None}
+        p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+        return {"p50": round(p50, 1), "p95": round(p95, 1), "p99": round(p99, 1)}
+
+    return {
+        "sessions": sessions,
+        "failed": sessions - len(latencies),
+        "latency_ms": percentiles(all_latencies),
+        "step_latency_ms": {
+            step: percentiles([session[step] for session in latencies]) for step in STEPS
+        },
+        "throughput_reruns_per_s": round(len(all_latencies) / elapsed, 2),
+        "rss_per_session_mib": round((rss_after - rss_before) / sessions / 2**20, 1),
+    }
+
+
+def main(argv=None):
+    """
+    Command line entry point running the load test for growing session counts.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description="Load test DataVizQA with concurrent sessions.")
+    parser.add_argument("dataset", type=Path, help="CSV file uploaded by every session.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10], help="Session counts to test.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM seconds before the first token.")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Fake LLM seconds per token.")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds a single rerun may take.")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    server = FakeLLMServer(latency=args.latency, token_delay=args.token_delay).start()
+    os.environ["ANTHROPIC_BASE_URL"] = server.url
+
+    results = []
+    print(
+        f"{'sessions':>8} {'failed':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'reruns/s':>9} {'MiB/session':>12}"
+    )
+    for sessions in args.sessions:
+        result = run_load(args.dataset, sessions, args.timeout)
+        results.append(result)
+        latency = result["latency_ms"]
+        print(
+            f"{sessions:>8} {result['failed']:>7} {latency['p50']!s:>9} {latency['p95']!s:>9} "
+            f"{latency['p99']!s:>9} "
+            f"{result['throughput_reruns_per_s']:>9} {result['rss_per_session_mib']:>12}"
+        )
+
+    server.shutdown()
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import os
 import sys
 
 sys.path.insert(0, os.path.abspath("../.."))
+sys.path.insert(0, os.path.abspath("../../src/data_viz"))
 project = "DataVIZQA"
 copyright = "2025, Malek-Mehyar"
 author = "Malek-Mehyar"
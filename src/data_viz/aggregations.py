@@ -0,0 +1,285 @@
+"""
+Memoized aggregation helpers for generated visualization code.
+Most charts start with the same value counts, group-by aggregations or time
+resampling of the full dataset. The helpers are injected into the namespace
+the generated code is executed in, and the LLM is told to use them instead
+of the pandas equivalents.
+
+Results on the loaded dataset are cached by dataset fingerprint and
+aggregation spec in a cache shared by every session, bounded to
+``MAX_CACHE_BYTES``, so follow-up charts on the same columns reuse them
+instead of scanning the dataset again. Results on filtered or otherwise
+derived frames are computed directly.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Memory held by cached aggregation results, shared by every session
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+AGGREGATIONS = ("count", "sum", "mean", "median", "min", "max", "std", "nunique")
+
+# Guideline added to the visualization prompt, describing the helpers
+HELPERS_GUIDELINE = f"""- To aggregate df, or a DataFrame filtered from it, call these functions instead of the pandas equivalents. They return DataFrames and reuse the results of previous charts on the full df:
+          count_values(df, column, normalize=False): the values of a column and their "count" (or "proportion"), most frequent first.
+          aggregate(df, by, column=None, agg="mean"): the `by` column(s) and `agg` of `column`, or their row "count" when `column` is None.
+          resample(df, date_column, freq="D", column=None, agg="sum"): the periods of a date column and `agg` of `column`, or their row "count".
+          `agg` is one of {", ".join(AGGREGATIONS)}."""
+
+
+def dataset_fingerprint(df):
+    """
+    Hash the values, index, column names and dtypes of a DataFrame.
+
+    Args:
+        df (pd.DataFrame): The dataset.
+
+    Returns:
+        str: The fingerprint, or None if some values cannot be hashed.
+    """
+    try:
+        hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    except TypeError:
+        return None
+    digest = hashlib.blake2b(hashes.tobytes(), digest_size=16)
+    digest.update(repr([(column, str(dtype)) for column, dtype in df.dtypes.items()]).encode())
+    return digest.hexdigest()
+
+
+class AggregationCache:
+    """
+    Least recently used aggregation results, bounded by their memory usage.
+
+    Attributes:
+        max_bytes (int): Memory the cached results are allowed to hold.
+        hits (int): Number of results served from the cache.
+        misses (int): Number of results computed.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key, compute):
+        """
+        Return the cached result for a key, computing it if missing.
+
+        The result is computed without holding the lock, so concurrent
+        sessions missing the same key may both compute it. Results larger
+        than ``max_bytes`` are not cached.
+
+        Args:
+            key (tuple): The dataset fingerprint and aggregation spec.
+            compute (callable): Computes the result.
+
+        Returns:
+            pd.DataFrame: The result.
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key][0]
+            self.misses += 1
+
+        result = compute()
+        size = int(result.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if size <= self.max_bytes and key not in self._results:
+                self._results[key] = (result, size)
+                self._size += size
+                while self._size > self.max_bytes:
+                    _, (_, evicted) = self._results.popitem(last=False)
+                    self._size -= evicted
+        return result
+
+    def clear(self):
+        """Drop every cached result."""
+        with self._lock:
+            self._results.clear()
+            self._size = 0
+
+
+_cache = AggregationCache()
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fingerprint")
+
+
+class Aggregations:
+    """
+    Aggregation helpers for one loaded dataset.
+
+    The helpers take the frame to aggregate. Results on the loaded dataset
+    are cached, and results on any other frame, such as a filtered one, are
+    computed directly. Callers get a deep copy of each cached result, so
+    changing it in place does not change the cache shared by every session,
+    with or without pandas copy-on-write.
+
+    Attributes:
+        df (pd.DataFrame): The loaded dataset, which must not be modified.
+    """
+
+    def __init__(self, df, cache=None):
+        self.df = df
+        self._cache = _cache if cache is None else cache
+        self._source = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    @property
+    def fingerprint(self):
+        """The fingerprint of the dataset, computed once."""
+        if self._source is not None:
+            return self._source.fingerprint
+        with self._lock:
+            if self._fingerprint is None:
+                self._fingerprint = dataset_fingerprint(self.df) or ""
+        return self._fingerprint
+
+    def warm(self):
+        """Compute the fingerprint in the background, before the first helper call."""
+        _executor.submit(lambda: self.fingerprint)
+
+    def view(self):
+        """
+        Return helpers bound to a shallow copy of the dataset.
+
+        The copy shares the fingerprint of the dataset, and can be handed to
+        code that rebinds or reads ``df``. Without pandas copy-on-write, its
+        values are shared with the loaded dataset, so it must not be handed
+        to code that modifies them in place.
+
+        Returns:
+            Aggregations: The helpers bound to the copy.
+        """
+        view = Aggregations(self.df.copy(deep=False), self._cache)
+        view._source = self
+        return view
+
+    def _memoize(self, df, spec, compute):
+        if df is not self.df or not self.fingerprint:
+            return compute(df)
+        # Aggregates are small: a deep copy keeps the shared result intact
+        return self._cache.get((self.fingerprint, *spec), lambda: compute(df)).copy()
+
+    def count_values(self, df, column, normalize=False):
+        """
+        Count the values of a column.
+
+        Args:
+            df (pd.DataFrame): The frame to aggregate.
+            column (str): The column.
+            normalize (bool): Whether to return proportions instead of counts.
+
+        Returns:
+            pd.DataFrame: The values and their "count" or "proportion", most
+            frequent first.
+        """
+        return self._memoize(
+            df,
+            ("count_values", column, normalize),
+            lambda df: df[column].value_counts(normalize=normalize).reset_index(),
+        )
+
+    def aggregate(self, df, by, column=None, agg="mean"):
+        """
+        Aggregate a column per group.
+
+        Args:
+            df (pd.DataFrame): The frame to aggregate.
+            by (str or list): The column(s) to group by.
+            column (str or list, optional): The aggregated column(s). The rows
+                of each group are counted when omitted.
+            agg (str): The aggregation, one of ``AGGREGATIONS``.
+
+        Returns:
+            pd.DataFrame: The groups and their aggregated values or "count".
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        _check_aggregation(agg)
+
+        def compute(df):
+            grouped = df.groupby(by, observed=True, sort=True)
+            if column is None:
+                return grouped.size().reset_index(name="count")
+            return grouped[column].agg(agg).reset_index()
+
+        return self._memoize(df, ("aggregate", tuple(by), _spec(column), agg), compute)
+
+    def resample(self, df, date_column, freq="D", column=None, agg="sum"):
+        """
+        Aggregate a column per period of a date column.
+
+        Args:
+            df (pd.DataFrame): The frame to aggregate.
+            date_column (str): The datetime column.
+            freq (str): The period, as a pandas frequency such as "D", "W" or "MS".
+            column (str or list, optional): The aggregated column(s). The rows
+                of each period are counted when omitted.
+            agg (str): The aggregation, one of ``AGGREGATIONS``.
+
+        Returns:
+            pd.DataFrame: The periods and their aggregated values or "count".
+        """
+        _check_aggregation(agg)
+
+        def compute(df):
+            grouped = df.groupby(pd.Grouper(key=date_column, freq=freq))
+            if column is None:
+                return grouped.size().reset_index(name="count")
+            return grouped[column].agg(agg).reset_index()
+
+        return self._memoize(df, ("resample", date_column, freq, _spec(column), agg), compute)
+
+    def namespace(self, modifies_df=False):
+        """
+        Return the dataset and helpers to execute generated code with.
+
+        ``df`` is bound to a copy of the dataset, so the code cannot change
+        the loaded one, and helper results on it are cached. When the code
+        modifies ``df`` in place, the copy is a deep one, and helper results
+        are computed without the cache.
+
+        Args:
+            modifies_df (bool): Whether the code modifies ``df`` in place,
+                as found by :func:`code_analysis.modifies_dataset`.
+
+        Returns:
+            dict: ``df`` and the helper names mapped to the bound methods.
+        """
+        if modifies_df:
+            df, helpers = self.df.copy(), self
+        else:
+            helpers = self.view()
+            df = helpers.df
+        return {
+            "df": df,
+            "count_values": helpers.count_values,
+            "aggregate": helpers.aggregate,
+            "resample": helpers.resample,
+        }
+
+
+def _check_aggregation(agg):
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Unsupported aggregation '{agg}'. Use one of: {', '.join(AGGREGATIONS)}")
+
+
+def _spec(column):
+    """Make a column argument hashable."""
+    return column if column is None or isinstance(column, str) else tuple(column)
@@ -1,11 +1,17 @@
 import streamlit as st
-import re
 import logging
-from llm_integration import call_llm_for_viz
+from aggregations import Aggregations
+from code_analysis import modifies_dataset, prepare_generated_code
+from llm_integration import call_llm_for_viz, extract_python_code
+from insights import stored_figures_section
+from speculation import MAX_SPECULATIVE_CHARTS, SUGGESTIONS_REFRESH, Speculation, normalize_request
 from utils import (
-    read_uploaded_file,
-    clean_dataframe,
+    timed_run,
+    load_uploaded_dataset,
+    clean_loaded_dataset,
     display_dataframe_overview,
+    run_generated_code,
+    store_figures,
 )
 
 # Configure logging
@@ -26,7 +32,9 @@ def data_viz_chat_page():
     - Code generation and visualization rendering
     
     The function maintains the state of both raw and cleaned DataFrames using
-    Streamlit's session state, ensuring persistence across reruns.
+    Streamlit's session state, ensuring persistence across reruns. The dataset
+    view and the visualization request are rendered as independent fragments,
+    so interacting with one of them does not rerun the rest of the page.
     
     Returns:
         None. All output is rendered directly to the Streamlit interface.
@@ -53,103 +61,259 @@ def data_viz_chat_page():
         st.warning("⚠️ Please enter a valid API key to proceed.")
         return
 
-    df = None
-    uploaded_file = st.file_uploader("Choose a file", type=["csv", "xlsx"])
+    uploaded_files = st.file_uploader(
+        "Choose files, or a zip archive of them",
+        type=["csv", "xlsx", "zip"],
+        accept_multiple_files=True,
+    )
     
-    if uploaded_file:
+    if uploaded_files:
         # Initialize session state for storing DataFrames if not exists
         if "raw_df" not in st.session_state:
             st.session_state.raw_df = None
         if "cleaned_df" not in st.session_state:
             st.session_state.cleaned_df = None
         
-        # Read the file if it hasn't been read yet
-        if st.session_state.raw_df is None:
-            st.session_state.raw_df = read_uploaded_file(uploaded_file)
-            df = st.session_state.raw_df
+        # Read the file, or only its changed rows if it is a new version
+        load_uploaded_dataset(uploaded_files)
         
         if st.session_state.raw_df is not None:
-            col1, col2 = st.columns([1, 2])
-            with col1:
-                if st.button("🧹 Clean Data"):
-                    st.session_state.cleaned_df = clean_dataframe(
-                        st.session_state.raw_df
-                    )
-                    df = st.session_state.cleaned_df
-                    st.success("Data cleaned successfully!")
-            
-            with col2:
-                show_cleaned = st.toggle(
-                    "Show cleaned data",
-                    value=False,
-                    disabled=st.session_state.cleaned_df is None,
-                )
-            
-            # Display either raw or cleaned data based on toggle state
-            if show_cleaned and st.session_state.cleaned_df is not None:
-                display_dataframe_overview(st.session_state.cleaned_df)
-                st.write("### 📈 Dataset Summary")
-                st.write(st.session_state.cleaned_df.describe())
-                st.info("Showing cleaned data")
-                df = st.session_state.cleaned_df
-            else:
-                display_dataframe_overview(st.session_state.raw_df)
-                st.write("### 📈 Dataset Summary")
-                st.write(st.session_state.raw_df.describe())
-                st.info("Showing raw data")
-                df = st.session_state.raw_df
+            dataset_section()
     
-    user_prompt = st.text_area(
-        "📝 Describe the visualization you want:",
-        placeholder="Example: Show a bar chart of categorical data",
+    visualization_section(has_file=bool(uploaded_files))
+
+
+def dataset_summary(df_key):
+    """
+    Return the summary statistics of a session DataFrame.
+
+    The statistics come from the running profile of the loaded dataset
+    version, which is updated incrementally when a new version is uploaded,
+    so the dataset is never scanned again to render them.
+
+    Parameters:
+    df_key: str, either "raw_df" or "cleaned_df"
+
+    Returns:
+    pd.DataFrame: Summary statistics of the numeric columns
+    """
+    dataset = st.session_state.dataset
+    if df_key == "cleaned_df":
+        return dataset.cleaned_profile.describe()
+    return dataset.raw_profile.describe()
+
+
+def active_df_key():
+    """
+    Return the session state key of the DataFrame selected for visualization.
+
+    Returns:
+    str: "cleaned_df" when cleaned data is shown, "raw_df" otherwise
+    """
+    if (
+        st.session_state.get("show_cleaned", False)
+        and st.session_state.get("cleaned_df") is not None
+    ):
+        return "cleaned_df"
+    return "raw_df"
+
+
+def speculation_for(df_key):
+    """
+    Return the speculative work on a session DataFrame.
+
+    The work is started in the background the first time the DataFrame is
+    seen, and restarted when it is replaced by a new upload or version, or
+    by the other view of the data. Restarting cancels the queued work of
+    the previous DataFrame, and the charts generated for one upload are
+    capped to ``MAX_SPECULATIVE_CHARTS`` across its raw and cleaned views.
+
+    Parameters:
+    df_key: str, either "raw_df" or "cleaned_df"
+
+    Returns:
+    Speculation: The speculative work on the DataFrame
+    """
+    df = st.session_state[df_key]
+    speculation = st.session_state.get("speculation")
+    if speculation is not None and speculation.df is df:
+        return speculation
+
+    upload = st.session_state.get("dataset_file_id")
+    spent_upload, spent = st.session_state.get("speculation_spent", (None, 0))
+    if speculation is not None:
+        speculation.cancel()
+        spent += speculation.started
+    if spent_upload != upload:
+        spent = 0
+    st.session_state.speculation_spent = (upload, spent)
+
+    speculation = Speculation(
+        df, st.session_state.api_key, charts=max(0, MAX_SPECULATIVE_CHARTS - spent)
     )
+    st.session_state.speculation = speculation
+    return speculation
+
+
+def aggregations_for(df_key):
+    """
+    Return the memoized aggregation helpers bound to a session DataFrame.
+
+    The helpers are bound again when the DataFrame is replaced by a new
+    upload or version, and the dataset fingerprint is computed in the
+    background until the first helper call.
+
+    Parameters:
+    df_key: str, either "raw_df" or "cleaned_df"
+
+    Returns:
+    Aggregations: The helpers bound to the DataFrame
+    """
+    bound = st.session_state.setdefault("aggregations", {})
+    df = st.session_state[df_key]
+    aggregations = bound.get(df_key)
+    if aggregations is None or aggregations.df is not df:
+        aggregations = Aggregations(df)
+        aggregations.warm()
+        bound[df_key] = aggregations
+    return aggregations
+
+
+@st.fragment
+@timed_run("dataset section")
+def dataset_section():
+    """
+    Renders the data cleaning controls, dataset overview and summary.
+
+    Runs as a fragment: cleaning the data or flipping the "Show cleaned data"
+    toggle only reruns this section.
+    """
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        if st.button("🧹 Clean Data"):
+            clean_loaded_dataset()
+            st.success("Data cleaned successfully!")
+    
+    with col2:
+        st.toggle(
+            "Show cleaned data",
+            value=False,
+            key="show_cleaned",
+            disabled=st.session_state.cleaned_df is None,
+        )
+    
+    # Display either raw or cleaned data based on toggle state
+    df_key = active_df_key()
+    display_dataframe_overview(st.session_state[df_key])
+    st.write("### 📈 Dataset Summary")
+    st.write(dataset_summary(df_key))
+    if df_key == "cleaned_df":
+        st.info("Showing cleaned data")
+    else:
+        st.info("Showing raw data")
+
+
+def suggestions_caption(speculation):
+    """
+    Renders the number of suggested visualizations ready to be shown.
+
+    Parameters:
+    speculation: Speculation, the speculative work on the selected dataset
+    """
+    ready = sum(speculation.ready(request) for request in speculation.requests)
+    st.caption(f"💡 Suggested visualizations ({ready} ready)")
+
+
+@st.fragment
+@timed_run("visualization section")
+def visualization_section(has_file):
+    """
+    Renders the visualization request form and the generated visualization.
+
+    The prompt is collected in a form, so typing does not trigger a rerun,
+    and submitting it only reruns this fragment. Suggested visualizations
+    are generated in the background once a dataset is loaded, and are
+    rendered without waiting for the LLM when requested.
+
+    Parameters:
+    has_file: bool, whether a dataset file is currently uploaded
+    """
+    with st.form("visualization_form"):
+        user_prompt = st.text_area(
+            "📝 Describe the visualization you want:",
+            placeholder="Example: Show a bar chart of categorical data",
+        )
+        submitted = st.form_submit_button("🚀 Generate Visualization")
+    
+    df = st.session_state[active_df_key()] if has_file else None
+    speculation = speculation_for(active_df_key()) if df is not None else None
     
-    if st.button("🚀 Generate Visualization"):
+    if speculation is not None and speculation.requests:
+        # Only the caption is refreshed while the suggestions are generated
+        refresh = SUGGESTIONS_REFRESH if speculation.pending else None
+        st.fragment(suggestions_caption, run_every=refresh)(speculation)
+        columns = st.columns(len(speculation.requests))
+        for column, request in zip(columns, speculation.requests):
+            if column.button(request, key=f"suggestion_{normalize_request(request)}"):
+                user_prompt, submitted = request, True
+    
+    if submitted:
         if df is not None:
             if user_prompt.strip():
                 with st.spinner("⏳ Generating visualization code..."):
                     try:
-                        # Call the LLM to generate code
-                        generated_code = call_llm_for_viz(
-                            df, user_prompt, API_KEY=st.session_state.api_key
-                        )
+                        # Use the speculative result, or call the LLM to generate code
+                        suggestion = speculation.lookup(user_prompt)
+                        if suggestion is not None:
+                            generated_code = suggestion.response
+                        else:
+                            generated_code = call_llm_for_viz(
+                                df,
+                                user_prompt,
+                                API_KEY=st.session_state.api_key,
+                                dataset_info=speculation.dataset_info(),
+                            )
                         
                         # Display the generated code
                         st.subheader("🖥 Generated Code")
                         st.code(generated_code, language="python")
                         
-                        # Dynamically replace 'df' with the actual DataFrame variable
-                        if show_cleaned and st.session_state.cleaned_df is not None:
-                            actual_df_variable = "st.session_state.cleaned_df"
-                        else:
-                            actual_df_variable = "st.session_state.raw_df"
-                        
-                        # Replace 'df' with the actual DataFrame variable in the generated code
-                        modified_code = generated_code.replace("df", actual_df_variable)
-                        
                         # Extract Python code from the response
-                        match = re.search(r"```python\n(.*?)\n```", modified_code, re.DOTALL)
-                        if match:
-                            python_code = match.group(1)
-                            safe_code = python_code.replace("plt.show()", "st.pyplot(plt)")
-                            
-                            # Execute the modified code
+                        python_code = extract_python_code(generated_code)
+                        if python_code.strip():
                             st.subheader("📊 Visualization")
                             try:
-                                if safe_code:
-                                    exec(safe_code, globals())
-                                st.markdown(
-                                    "💡 **Kindly save this plot to get insights on it from the section Get Insights.**"
-                                )
-                            except Exception as e:
-                                st.error(f"⚠️ Error executing visualization: {e}")
-                                logger.error(f"⚠️ Error executing visualization: {e}")
-                        elif modified_code:
-                            try:
-                                exec(modified_code, globals())
-                                st.markdown(
-                                    "💡 **Kindly save this plot to get insights on it from the section Get Insights.**"
-                                )
+                                # Rewrite slow pandas patterns before running the code
+                                if suggestion is not None:
+                                    analysis = suggestion.analysis
+                                else:
+                                    analysis = prepare_generated_code(
+                                        python_code, len(df), API_KEY=st.session_state.api_key
+                                    )
+                                if analysis.vectorized:
+                                    st.info("⚡ Row-wise code was replaced by this vectorized version:")
+                                    st.code(analysis.code, language="python")
+                                for issue in analysis.issues:
+                                    st.warning(f"⚠️ Line {issue.lineno}: {issue.message}")
+                                
+                                # Execute the code with 'df' bound to a shallow copy of the selected
+                                # DataFrame, so changes made by the code do not reach the session
+                                # DataFrame the aggregation helpers read
+                                safe_code = analysis.code.replace("plt.show()", "st.pyplot(plt)")
+                                namespace = {
+                                    "st": st,
+                                    **aggregations_for(active_df_key()).namespace(
+                                        modifies_dataset(safe_code)
+                                    ),
+                                }
+                                export_errors = []
+                                images = run_generated_code(safe_code, namespace, export_errors)
+                                store_figures(images, user_prompt)
+                                if export_errors:
+                                    st.warning(
+                                        "⚠️ This Plotly chart cannot be analyzed: it could not be "
+                                        "exported as an image. Install `kaleido` to analyze Plotly charts."
+                                    )
                             except Exception as e:
                                 st.error(f"⚠️ Error executing visualization: {e}")
                                 logger.error(f"⚠️ Error executing visualization: {e}")
@@ -163,5 +327,7 @@ def data_viz_chat_page():
         else:
             st.error("⚠️ Please upload a file to generate visualizations.")
     else:
-        if uploaded_file is None:
-            st.info("📂 Upload a file to get started!")
\ No newline at end of file
+        if not has_file:
+            st.info("📂 Upload a file to get started!")
+
+    stored_figures_section()
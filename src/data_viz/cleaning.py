@@ -0,0 +1,409 @@
+"""
+Dataset cleaning for the AI-Powered Data Visualization application.
+This module provides two ways of cleaning a dataset:
+- :func:`clean` derives every cleaning rule from the dataset it cleans
+- :func:`fit_cleaning_plan` derives the rules once into a serializable
+  :class:`CleaningPlan`, which :func:`apply_cleaning_plan` and
+  :func:`stream_cleaning_plan` replay on later files of the same schema
+  without computing any statistics
+
+Plans can be fitted and applied from the command line::
+
+    python src/data_viz/cleaning.py fit reference.csv plan.json
+    python src/data_viz/cleaning.py apply plan.json today.csv today_cleaned.csv
+"""
+
+import argparse
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from datetimes import FORMATS_ATTR, parse_datetime_columns
+
+logger = logging.getLogger(__name__)
+
+# Number of rows read at a time when streaming a plan over a CSV file
+DEFAULT_CHUNKSIZE = 100_000
+
+
+@dataclass
+class CleaningReport:
+    """
+    Summary of the changes made by :func:`clean`.
+
+    Attributes:
+        renamed_columns (dict): Original column name mapped to its cleaned name.
+        duplicates_removed (int): Number of duplicate rows dropped.
+        filled_missing (dict): Column name mapped to the number of filled values.
+    """
+
+    renamed_columns: dict = field(default_factory=dict)
+    duplicates_removed: int = 0
+    filled_missing: dict = field(default_factory=dict)
+
+
+class SeenHashes:
+    """
+    Hashes of the rows kept from previous chunks of a file.
+
+    The hashes are kept sorted in a uint64 array, 8 bytes per kept row, and
+    looked up with a binary search. Memory still grows with the number of
+    unique rows of the file.
+
+    Attributes:
+        values (np.ndarray): The sorted hashes.
+    """
+
+    def __init__(self):
+        self.values = np.empty(0, dtype="uint64")
+
+    def __len__(self):
+        return len(self.values)
+
+    def contains(self, hashes):
+        """
+        Look up hashes.
+
+        Args:
+            hashes (np.ndarray): uint64 hashes of rows.
+
+        Returns:
+            np.ndarray: Boolean mask of the hashes already seen.
+        """
+        positions = np.searchsorted(self.values, hashes)
+        found = positions < len(self.values)
+        found[found] = self.values[positions[found]] == hashes[found]
+        return found
+
+    def add(self, hashes):
+        """
+        Add hashes that were not seen yet.
+
+        Args:
+            hashes (np.ndarray): Distinct uint64 hashes of rows.
+        """
+        # The stable sort merges the two sorted runs in linear time
+        self.values = np.sort(np.concatenate([self.values, np.sort(hashes)]), kind="stable")
+
+
+@dataclass
+class CleaningPlan:
+    """
+    Cleaning rules fitted on a reference dataset, replayable on new files.
+
+    Attributes:
+        columns (list): Original column names the plan expects.
+        renames (dict): Original column name mapped to its cleaned name.
+        dedup_columns (list): Cleaned column names identifying duplicate rows.
+        fill_values (dict): Cleaned column name mapped to its missing-value fill.
+        strip_columns (list): Cleaned string columns whose whitespace is stripped.
+        datetime_formats (dict): Original column name mapped to the format its
+            dates are parsed with.
+    """
+
+    columns: list
+    renames: dict = field(default_factory=dict)
+    dedup_columns: list = field(default_factory=list)
+    fill_values: dict = field(default_factory=dict)
+    strip_columns: list = field(default_factory=list)
+    datetime_formats: dict = field(default_factory=dict)
+
+    def save(self, path):
+        """
+        Write the plan to a JSON file.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+        with open(path, "w") as f:
+            json.dump(asdict(self), f, indent=2, default=str)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a plan from a JSON file written by :meth:`save`.
+
+        Args:
+            path (str): Path of the JSON file.
+
+        Returns:
+            CleaningPlan: The plan.
+        """
+        with open(path) as f:
+            return cls(**json.load(f))
+
+
+def column_renames(columns):
+    """
+    Map column names to their cleaned form.
+
+    Names are stripped, lowercased, whitespace is replaced by underscores and
+    punctuation removed.
+
+    Args:
+        columns (pd.Index): The original column names.
+
+    Returns:
+        dict: Original column name mapped to its cleaned name, for the names that change.
+    """
+    cleaned = columns.str.strip()
+    cleaned = cleaned.str.lower()
+    cleaned = cleaned.str.replace(r"\s+", "_", regex=True)
+    cleaned = cleaned.str.replace(r"[^\w\s]", "", regex=True)
+    return {
+        original: new
+        for original, new in zip(columns, cleaned)
+        if original != new
+    }
+
+
+def clean(df):
+    """
+    Clean the input DataFrame.
+
+    Column names are normalized, duplicate rows removed, missing values filled
+    with the median (numeric columns) or the mode (other columns) and
+    whitespace stripped from string columns.
+
+    Args:
+        df (pd.DataFrame): The dataset to clean. It is not modified.
+
+    Returns:
+        tuple[pd.DataFrame, CleaningReport]: The cleaned dataset and a summary of the changes.
+    """
+    report = CleaningReport()
+
+    # Make a copy to avoid modifying original data
+    df_cleaned = df.copy()
+
+    # Clean column names
+    report.renamed_columns = column_renames(df_cleaned.columns)
+    df_cleaned = df_cleaned.rename(columns=report.renamed_columns)
+
+    # Remove duplicate rows
+    initial_rows = len(df_cleaned)
+    df_cleaned = df_cleaned.drop_duplicates()
+    report.duplicates_removed = initial_rows - len(df_cleaned)
+
+    # Handle missing values
+    for column in df_cleaned.columns:
+        missing_count = df_cleaned[column].isnull().sum()
+        if missing_count > 0:
+            if pd.api.types.is_numeric_dtype(df_cleaned[column]):
+                df_cleaned[column] = df_cleaned[column].fillna(
+                    df_cleaned[column].median()
+                )
+            else:
+                if not df_cleaned[column].mode().empty:
+                    df_cleaned[column] = df_cleaned[column].fillna(
+                        df_cleaned[column].mode()[0]
+                    )
+                else:
+                    df_cleaned[column] = df_cleaned[column].fillna("")
+            report.filled_missing[column] = int(missing_count)
+
+    # Strip whitespace from string columns
+    for column in df_cleaned.select_dtypes(include=["object"]):
+        df_cleaned[column] = df_cleaned[column].str.strip()
+
+    return df_cleaned, report
+
+
+def fit_cleaning_plan(df, dedup_columns=None):
+    """
+    Derive the cleaning rules of a reference dataset into a plan.
+
+    The fill values are computed the same way as in :func:`clean`, but for
+    every column, so that files with missing values in other columns than the
+    reference are cleaned too. The formats of the date columns parsed at
+    ingest are recorded, so later files are parsed the same way.
+
+    Args:
+        df (pd.DataFrame): The reference dataset.
+        dedup_columns (list, optional): Cleaned column names identifying
+            duplicate rows. Defaults to all columns.
+
+    Returns:
+        CleaningPlan: The fitted plan.
+    """
+    renames = column_renames(df.columns)
+    df_renamed = df.rename(columns=renames).drop_duplicates()
+
+    fill_values = {}
+    for column in df_renamed.columns:
+        if pd.api.types.is_numeric_dtype(df_renamed[column]):
+            value = df_renamed[column].median()
+        else:
+            mode = df_renamed[column].mode()
+            value = mode[0] if not mode.empty else ""
+        if isinstance(value, np.generic):
+            value = value.item()
+        if not pd.isna(value):
+            fill_values[column] = value
+
+    return CleaningPlan(
+        columns=list(df.columns),
+        renames=renames,
+        dedup_columns=list(dedup_columns or df_renamed.columns),
+        fill_values=fill_values,
+        strip_columns=list(
+            df_renamed.select_dtypes(include=["object", "string"]).columns
+        ),
+        datetime_formats=dict(df.attrs.get(FORMATS_ATTR, {})),
+    )
+
+
+def apply_cleaning_plan(df, plan, seen_hashes=None):
+    """
+    Clean a DataFrame with the rules of a fitted plan.
+
+    No statistics are computed: date columns are parsed with the plan
+    formats, columns are renamed, duplicates dropped by row hash, missing
+    values filled with the plan values in a single ``fillna`` and whitespace
+    stripped from the plan string columns.
+
+    Args:
+        df (pd.DataFrame): The dataset to clean. It is not modified.
+        plan (CleaningPlan): The fitted plan.
+        seen_hashes (SeenHashes, optional): Hashes of the rows kept from
+            previous chunks of the same file. Rows matching one of them are
+            dropped as duplicates, and the hashes of the kept rows are added.
+
+    Returns:
+        tuple[pd.DataFrame, CleaningReport]: The cleaned dataset and a summary of the changes.
+
+    Raises:
+        ValueError: If the dataset lacks columns the plan expects.
+    """
+    missing_columns = [column for column in plan.columns if column not in df.columns]
+    if missing_columns:
+        raise ValueError(
+            f"Dataset is missing columns expected by the cleaning plan: {missing_columns}"
+        )
+
+    report = CleaningReport(renamed_columns=dict(plan.renames))
+    if plan.datetime_formats:
+        df = parse_datetime_columns(df, plan.datetime_formats)
+    df_cleaned = df.rename(columns=plan.renames)
+
+    # Remove duplicate rows, within the frame and against previous chunks
+    hashes = pd.util.hash_pandas_object(df_cleaned[plan.dedup_columns], index=False)
+    duplicated = hashes.duplicated().to_numpy()
+    if seen_hashes is not None:
+        hash_values = hashes.to_numpy()
+        duplicated = duplicated | seen_hashes.contains(hash_values)
+        seen_hashes.add(hash_values[~duplicated])
+    if duplicated.any():
+        df_cleaned = df_cleaned[~duplicated]
+    report.duplicates_removed = int(duplicated.sum())
+
+    # Handle missing values
+    missing_counts = df_cleaned.isnull().sum()
+    report.filled_missing = {
+        column: int(count)
+        for column, count in missing_counts.items()
+        if count and column in plan.fill_values
+    }
+    if report.filled_missing:
+        # Dates are stored as strings in saved plans
+        fill_values = {
+            column: pd.Timestamp(value)
+            if pd.api.types.is_datetime64_any_dtype(df_cleaned[column])
+            else value
+            for column, value in plan.fill_values.items()
+            if column in report.filled_missing
+        }
+        df_cleaned = df_cleaned.fillna(value=fill_values)
+
+    # Strip whitespace from string columns
+    for column in plan.strip_columns:
+        if pd.api.types.is_object_dtype(df_cleaned[column]) or pd.api.types.is_string_dtype(
+            df_cleaned[column]
+        ):
+            df_cleaned[column] = df_cleaned[column].str.strip()
+
+    return df_cleaned, report
+
+
+def stream_cleaning_plan(path, plan, output_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Apply a fitted plan to a file chunk by chunk and write the result as CSV.
+
+    CSV files are read ``chunksize`` rows at a time, so memory holds one
+    chunk and the 8-byte hash of every row kept to drop duplicates across
+    chunks. Excel files cannot be read in chunks and are cleaned in one go.
+
+    Args:
+        path (str): Path of the CSV or Excel file to clean.
+        plan (CleaningPlan): The fitted plan.
+        output_path (str): Path of the cleaned CSV file.
+        chunksize (int): Number of rows per chunk.
+
+    Returns:
+        CleaningReport: Summary of the changes over the whole file.
+    """
+    if str(path).endswith(".csv"):
+        chunks = pd.read_csv(path, chunksize=chunksize)
+    else:
+        chunks = [pd.read_excel(path)]
+
+    report = CleaningReport(renamed_columns=dict(plan.renames))
+    seen_hashes = SeenHashes()
+    first_chunk = True
+    for chunk in chunks:
+        chunk, chunk_report = apply_cleaning_plan(chunk, plan, seen_hashes)
+        chunk.to_csv(
+            output_path, mode="w" if first_chunk else "a", header=first_chunk, index=False
+        )
+        first_chunk = False
+
+        report.duplicates_removed += chunk_report.duplicates_removed
+        for column, count in chunk_report.filled_missing.items():
+            report.filled_missing[column] = report.filled_missing.get(column, 0) + count
+
+    return report
+
+
+def main(argv=None):
+    """
+    Command line entry point to fit a plan or apply it to a file.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description="Fit and apply DataVizQA cleaning plans.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fit_parser = subparsers.add_parser("fit", help="Fit a plan on a reference CSV file.")
+    fit_parser.add_argument("dataset", help="Reference CSV file.")
+    fit_parser.add_argument("plan", help="Path of the JSON plan to write.")
+
+    apply_parser = subparsers.add_parser("apply", help="Apply a plan to a CSV or Excel file.")
+    apply_parser.add_argument("plan", help="JSON plan written by the fit command.")
+    apply_parser.add_argument("dataset", help="File to clean.")
+    apply_parser.add_argument("output", help="Path of the cleaned CSV file.")
+    apply_parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    if args.command == "fit":
+        fit_cleaning_plan(parse_datetime_columns(pd.read_csv(args.dataset))).save(args.plan)
+        logger.info(f"Cleaning plan written to {args.plan}")
+    else:
+        report = stream_cleaning_plan(
+            args.dataset, CleaningPlan.load(args.plan), args.output, args.chunksize
+        )
+        logger.info(
+            f"Removed {report.duplicates_removed} duplicate rows, "
+            f"filled {sum(report.filled_missing.values())} missing values"
+        )
+
+
+if __name__ == "__main__":
+    main()
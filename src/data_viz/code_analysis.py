@@ -0,0 +1,495 @@
+"""
+Static analysis of LLM-generated visualization code.
+The generated code is parsed before it is executed to:
+- Remove statements that redefine the ``df`` dataset instead of using it
+- Detect row-wise pandas patterns (``iterrows``, row-wise ``apply``, Python
+  loops over rows) that freeze the app on large datasets
+- Bound point-per-row plots of the full dataset to a random sample
+
+Row-wise patterns cannot be rewritten mechanically, so
+:func:`prepare_generated_code` asks the LLM for a vectorized version of code
+that contains them.
+"""
+
+import ast
+import logging
+from dataclasses import dataclass, field
+
+from llm_integration import call_llm_for_vectorized_code, extract_python_code
+
+logger = logging.getLogger(__name__)
+
+# Name of the dataset in the namespace the generated code is executed in
+DATAFRAME_NAME = "df"
+
+# Name bound to the sampled dataset used by bounded plots
+SAMPLE_NAME = "df_sample"
+
+# Maximum number of rows drawn by a point-per-row plot
+MAX_PLOT_POINTS = 10_000
+
+# Datasets with more rows than this get row-wise code sent back to the LLM
+ROW_WISE_ROW_LIMIT = 10_000
+
+# Names pandas is imported as
+PANDAS_NAMES = {"pd", "pandas"}
+
+ROW_ITERATION_METHODS = {"iterrows", "itertuples"}
+
+# Plotting functions drawing one mark per row of their data
+POINT_PLOT_FUNCTIONS = {"scatter", "scatterplot", "stripplot", "swarmplot"}
+
+# Plotting functions drawing one mark per row unless their ``kind`` aggregates
+KIND_PLOT_FUNCTIONS = {"plot", "line"}
+
+# Kinds of ``.plot(kind=...)`` drawing one mark per row
+POINT_PLOT_KINDS = {"line", "scatter"}
+
+# Methods returning the same rows as the frame they are called on
+ROW_PRESERVING_METHODS = {"dropna", "sort_values", "sort_index", "reset_index", "copy", "astype", "fillna"}
+
+ROW_WISE_KINDS = {"row_iteration", "row_apply", "python_loop"}
+
+# Modules drawing on pyplot figures, and the names they are usually imported as
+PYPLOT_MODULES = ("matplotlib", "seaborn", "pandas.plotting")
+PYPLOT_NAMES = {"plt", "pyplot", "matplotlib", "sns", "seaborn"}
+
+# Calls importing or running code that cannot be analyzed
+DYNAMIC_CALLS = {"__import__", "import_module", "exec", "eval"}
+
+# pandas methods drawing on pyplot figures
+PANDAS_PLOT_METHODS = {"plot", "hist", "boxplot"}
+
+# Methods changing the frame they are called on without ``inplace=True``
+MUTATING_METHODS = {"insert", "pop", "update"}
+
+
+@dataclass
+class CodeIssue:
+    """
+    A problem found in generated code.
+
+    Attributes:
+        kind (str): One of "row_iteration", "row_apply", "python_loop",
+            "unbounded_plot" or "df_redefinition".
+        lineno (int): Line of the generated code the issue was found on.
+        message (str): Human readable description of the issue.
+    """
+
+    kind: str
+    lineno: int
+    message: str
+
+
+@dataclass
+class CodeAnalysis:
+    """
+    Result of :func:`analyze_code`.
+
+    Attributes:
+        code (str): The code with dataset redefinitions removed and unbounded
+            plots rewritten to a sample.
+        issues (list[CodeIssue]): Every issue found, rewritten or not.
+        vectorized (bool): Whether the code is a vectorized version requested
+            from the LLM in place of the original code.
+    """
+
+    code: str
+    issues: list = field(default_factory=list)
+    vectorized: bool = False
+
+    @property
+    def row_wise_issues(self):
+        """The issues that can only be fixed by vectorizing the code."""
+        return [issue for issue in self.issues if issue.kind in ROW_WISE_KINDS]
+
+
+def _references_df(node):
+    """Return whether the expression refers to the dataset."""
+    return any(
+        isinstance(child, ast.Name) and child.id == DATAFRAME_NAME
+        for child in ast.walk(node)
+    )
+
+
+def _is_literal(node):
+    """Return whether the expression only holds literal values."""
+    try:
+        ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return False
+    return True
+
+
+def _loads_other_data(node):
+    """Return whether the expression reads a file or builds example data with pandas."""
+    if not (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id in PANDAS_NAMES
+    ):
+        return False
+    if node.func.attr.startswith("read_"):
+        return True
+    return node.func.attr == "DataFrame" and all(
+        _is_literal(value) for value in node.args + [keyword.value for keyword in node.keywords]
+    )
+
+
+def _is_full_frame(node):
+    """Return whether the expression has one row per row of the dataset."""
+    if isinstance(node, ast.Name):
+        return node.id == DATAFRAME_NAME
+    if isinstance(node, (ast.Subscript, ast.Attribute)):
+        return _is_full_frame(node.value)
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr in ROW_PRESERVING_METHODS
+    ):
+        return _is_full_frame(node.func.value)
+    return False
+
+
+def _draws_every_row(node):
+    """Return whether a plotting call draws one mark per row of its data."""
+    attr = node.func.attr
+    if attr in POINT_PLOT_FUNCTIONS:
+        return True
+    if attr not in KIND_PLOT_FUNCTIONS:
+        return False
+    kinds = [keyword.value for keyword in node.keywords if keyword.arg == "kind"]
+    if not kinds:
+        return True
+    # Histograms, box plots and other kinds summarize the rows they are given
+    return isinstance(kinds[0], ast.Constant) and kinds[0].value in POINT_PLOT_KINDS
+
+
+def _counts_rows(node):
+    """Return whether the expression is the number of rows of the dataset, as ``len(df)``."""
+    if not (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "len"
+        and len(node.args) == 1
+    ):
+        return False
+    counted = node.args[0]
+    if isinstance(counted, ast.Attribute) and counted.attr == "columns":
+        return False
+    return _is_full_frame(counted)
+
+
+def _iterates_rows(node):
+    """Return whether a loop over the expression visits every row of the dataset."""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        if node.func.id == "range":
+            return any(_counts_rows(arg) for arg in node.args)
+        if node.func.id in ("zip", "enumerate"):
+            return any(_iterates_rows(arg) for arg in node.args)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        if node.func.attr in ("to_numpy", "tolist"):
+            return _is_full_frame(node.func.value)
+    if isinstance(node, ast.Attribute) and node.attr in ("index", "values"):
+        return _is_full_frame(node.value)
+    if isinstance(node, ast.Subscript) and not isinstance(node.slice, ast.List):
+        # df["a"] is a column whose values are iterated, df[["a", "b"]] a frame
+        return _is_full_frame(node)
+    return False
+
+
+class _IssueFinder(ast.NodeVisitor):
+    """Collect the row-wise patterns and unbounded plots of a statement."""
+
+    def __init__(self, bound_plots):
+        self.bound_plots = bound_plots
+        self.issues = []
+        self.unbounded_plots = []
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Attribute):
+            attr = node.func.attr
+            if attr in ROW_ITERATION_METHODS:
+                self.issues.append(
+                    CodeIssue("row_iteration", node.lineno, f"`.{attr}()` iterates over rows one by one")
+                )
+            elif attr == "apply" and any(
+                keyword.arg == "axis"
+                and isinstance(keyword.value, ast.Constant)
+                and keyword.value.value in (1, "columns")
+                for keyword in node.keywords
+            ):
+                self.issues.append(
+                    CodeIssue("row_apply", node.lineno, "`.apply(..., axis=1)` calls Python once per row")
+                )
+            elif self.bound_plots and _draws_every_row(node) and self._plots_full_frame(node):
+                self.issues.append(
+                    CodeIssue(
+                        "unbounded_plot",
+                        node.lineno,
+                        f"`{attr}` draws every row of the dataset; plotting a sample of {MAX_PLOT_POINTS} rows",
+                    )
+                )
+                self.unbounded_plots.append(node)
+        self.generic_visit(node)
+
+    def _plots_full_frame(self, node):
+        # df.plot(...), df["a"].plot(...) and df.plot.scatter(...)
+        receiver = node.func.value
+        if isinstance(receiver, ast.Attribute) and receiver.attr == "plot":
+            receiver = receiver.value
+        if _is_full_frame(receiver):
+            return True
+        values = node.args + [keyword.value for keyword in node.keywords]
+        return any(_is_full_frame(value) for value in values)
+
+    def _visit_loop(self, iter_node, lineno):
+        if _iterates_rows(iter_node):
+            self.issues.append(
+                CodeIssue("python_loop", lineno, "Python loop over the rows of the dataset")
+            )
+
+    def visit_For(self, node):
+        self._visit_loop(node.iter, node.lineno)
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node):
+        self._visit_loop(node.iter, node.iter.lineno)
+        self.generic_visit(node)
+
+
+class _SampleRewriter(ast.NodeTransformer):
+    """Point the dataset references of the given calls to the sample."""
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.inside = 0
+
+    def visit_Call(self, node):
+        bounded = node in self.calls
+        self.inside += bounded
+        self.generic_visit(node)
+        self.inside -= bounded
+        return node
+
+    def visit_Name(self, node):
+        if self.inside and node.id == DATAFRAME_NAME:
+            return ast.copy_location(ast.Name(id=SAMPLE_NAME, ctx=node.ctx), node)
+        return node
+
+
+def _is_dataset_part(node):
+    """Return whether the expression is ``df`` or a column, cell or attribute of it."""
+    while isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return isinstance(node, ast.Name) and node.id == DATAFRAME_NAME
+
+
+def modifies_dataset(code):
+    """
+    Return whether code modifies the ``df`` frame it is given in place.
+
+    Assigning or deleting its columns, cells or attributes, and calling its
+    methods with ``inplace=True`` or methods such as ``insert`` modify the
+    frame. Rebinding the ``df`` name to another frame does not.
+
+    Args:
+        code (str): The Python code.
+
+    Returns:
+        bool: Whether the frame may be modified.
+    """
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, (ast.Assign, ast.Delete)):
+            targets = node.targets
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            targets = [node.target]
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if _is_dataset_part(node.func.value) and (
+                node.func.attr in MUTATING_METHODS
+                or any(
+                    keyword.arg == "inplace"
+                    and not (isinstance(keyword.value, ast.Constant) and not keyword.value.value)
+                    for keyword in node.keywords
+                )
+            ):
+                return True
+            continue
+        else:
+            continue
+        for target in targets:
+            for part in ast.walk(target):
+                if isinstance(part, (ast.Subscript, ast.Attribute)) and _is_dataset_part(part):
+                    return True
+    return False
+
+
+def _is_pyplot_module(name):
+    return any(name == module or name.startswith(f"{module}.") for module in PYPLOT_MODULES)
+
+
+def _pyplot_aliases(tree):
+    """Collect the names the imports of the code bind to pyplot modules or their members."""
+    names = set(PYPLOT_NAMES)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if _is_pyplot_module(alias.name):
+                    names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            for alias in node.names:
+                if _is_pyplot_module(node.module) or _is_pyplot_module(f"{node.module}.{alias.name}"):
+                    names.add(alias.asname or alias.name)
+    return names
+
+
+def _uses_pyplot(statement, names):
+    """
+    Return whether a statement may create or draw on pyplot figures.
+
+    Statements that may do so in ways that cannot be followed, such as star
+    imports from pyplot modules or dynamic imports, are assumed to.
+    """
+    if isinstance(statement, ast.ImportFrom) and statement.module:
+        return _is_pyplot_module(statement.module) and any(
+            alias.name == "*" for alias in statement.names
+        )
+    if isinstance(statement, ast.Import):
+        return False
+    for node in ast.walk(statement):
+        if isinstance(node, ast.Name) and node.id in names | DYNAMIC_CALLS:
+            return True
+        if isinstance(node, ast.Attribute) and node.attr in PANDAS_PLOT_METHODS | DYNAMIC_CALLS:
+            return True
+    return False
+
+
+def split_plotting_code(code):
+    """
+    Split code before the first statement that may use pyplot.
+
+    The data preparation before that statement does not touch the pyplot
+    figures shared by every session, so it can run without holding the
+    figure lock. pyplot is recognized under the names the code imports
+    matplotlib, seaborn and their members as.
+
+    Args:
+        code (str): The Python code.
+
+    Returns:
+        tuple[str, str]: The preparation and plotting code. Line numbers of
+        the plotting code are kept, so errors point to the generated code.
+    """
+    tree = ast.parse(code)
+    names = _pyplot_aliases(tree)
+    for statement in tree.body:
+        if _uses_pyplot(statement, names):
+            decorators = getattr(statement, "decorator_list", [])
+            start = min([statement.lineno] + [decorator.lineno for decorator in decorators])
+            lines = code.splitlines(keepends=True)
+            return "".join(lines[: start - 1]), "\n" * (start - 1) + "".join(lines[start - 1 :])
+    return code, ""
+
+
+def _sample_statement():
+    """Build ``df_sample = df.sample(n=min(len(df), N), random_state=0).sort_index()``."""
+    return ast.parse(
+        f"{SAMPLE_NAME} = {DATAFRAME_NAME}.sample("
+        f"n=min(len({DATAFRAME_NAME}), {MAX_PLOT_POINTS}), random_state=0).sort_index()"
+    ).body[0]
+
+
+def analyze_code(code, n_rows):
+    """
+    Analyze generated code and rewrite the patterns that can be fixed safely.
+
+    Assignments that redefine ``df`` by reading a file or building example
+    data from literals with pandas are removed. When the dataset has more than
+    ``MAX_PLOT_POINTS`` rows, point-per-row plots of the full dataset are
+    rewritten to plot a sorted random sample instead.
+
+    Args:
+        code (str): The generated Python code, referring to the dataset as ``df``.
+        n_rows (int): Number of rows of the dataset the code will run on.
+
+    Returns:
+        CodeAnalysis: The rewritten code and the issues found.
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+    """
+    tree = ast.parse(code)
+    issues = []
+    body = []
+
+    for statement in tree.body:
+        if (
+            isinstance(statement, ast.Assign)
+            and any(
+                isinstance(target, ast.Name) and target.id == DATAFRAME_NAME
+                for target in statement.targets
+            )
+            and _loads_other_data(statement.value)
+        ):
+            issues.append(
+                CodeIssue("df_redefinition", statement.lineno, "`df` is redefined instead of using the dataset")
+            )
+            continue
+
+        finder = _IssueFinder(bound_plots=n_rows > MAX_PLOT_POINTS)
+        finder.visit(statement)
+        issues.extend(finder.issues)
+        if finder.unbounded_plots:
+            body.append(_sample_statement())
+            statement = _SampleRewriter(finder.unbounded_plots).visit(statement)
+        body.append(statement)
+
+    if not any(issue.kind in ("df_redefinition", "unbounded_plot") for issue in issues):
+        return CodeAnalysis(code=code, issues=issues)
+
+    tree.body = body
+    return CodeAnalysis(code=ast.unparse(ast.fix_missing_locations(tree)), issues=issues)
+
+
+def prepare_generated_code(code, n_rows, API_KEY):
+    """
+    Make generated code safe to execute on a dataset of the given size.
+
+    The code is analyzed with :func:`analyze_code`. If it contains row-wise
+    patterns and the dataset has more than ``ROW_WISE_ROW_LIMIT`` rows, the
+    LLM is asked once for a vectorized version, which is analyzed in turn.
+    The original analysis is kept if the LLM call fails or its code does not
+    parse.
+
+    Args:
+        code (str): The generated Python code, referring to the dataset as ``df``.
+        n_rows (int): Number of rows of the dataset the code will run on.
+        API_KEY (str): The API key for the Anthropic service.
+
+    Returns:
+        CodeAnalysis: The analysis of the code to execute.
+    """
+    analysis = analyze_code(code, n_rows)
+
+    if analysis.row_wise_issues and n_rows > ROW_WISE_ROW_LIMIT:
+        logger.info(
+            f"Requesting vectorized code for {len(analysis.row_wise_issues)} row-wise patterns"
+        )
+        try:
+            vectorized = call_llm_for_vectorized_code(
+                code, [issue.message for issue in analysis.row_wise_issues], API_KEY=API_KEY
+            )
+        except Exception as e:
+            # Rate limits and network errors leave the original code to run
+            logger.error(f"❌ Error requesting vectorized code: {e}")
+            return analysis
+        try:
+            vectorized_analysis = analyze_code(extract_python_code(vectorized), n_rows)
+        except SyntaxError as e:
+            logger.error(f"❌ Vectorized code is not valid Python: {e}")
+        else:
+            vectorized_analysis.vectorized = True
+            analysis = vectorized_analysis
+
+    return analysis
@@ -0,0 +1,147 @@
+"""
+Datetime detection and parsing for ingested datasets.
+CSV files are read with their dates as strings. Each string column is
+checked on a sample of its values, a single format is inferred for it, and
+the whole column is parsed once with that format, which is vectorized
+instead of guessing the format of every value. Later stages then work on
+native ``datetime64`` columns.
+"""
+
+import logging
+import re
+import warnings
+
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+logger = logging.getLogger(__name__)
+
+# Number of values of a column checked before parsing it
+DATETIME_SAMPLE_SIZE = 1000
+
+# Number of sample values the candidate formats are guessed from
+GUESSED_VALUES = 5
+
+# Name of the DataFrame attribute mapping parsed columns to their format
+FORMATS_ATTR = "datetime_formats"
+
+
+def _is_date_format(fmt):
+    """Return whether a format has at least a year and a month."""
+    return bool(re.search(r"%[Yy]", fmt)) and bool(re.search(r"%[mbB]", fmt))
+
+
+def _candidate_formats(values):
+    """Guess formats from a few values, month first then day first."""
+    candidates = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        for value in values[:GUESSED_VALUES]:
+            for dayfirst in (False, True):
+                fmt = guess_datetime_format(value, dayfirst=dayfirst)
+                if fmt and _is_date_format(fmt) and fmt not in candidates:
+                    candidates.append(fmt)
+    return candidates
+
+
+def detect_datetime_format(series, sample_size=DATETIME_SAMPLE_SIZE):
+    """
+    Infer the datetime format of a string column from a sample of its values.
+
+    Args:
+        series (pd.Series): The column.
+        sample_size (int): Number of evenly spaced values checked.
+
+    Returns:
+        str: The format every sampled value parses with, or None if the
+        column does not hold dates.
+    """
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return None
+
+    values = series.dropna()
+    if values.empty:
+        return None
+    sample = values.iloc[:: max(1, len(values) // sample_size)]
+    if not all(isinstance(value, str) for value in sample.iloc[:GUESSED_VALUES]):
+        return None
+
+    for fmt in _candidate_formats(sample.tolist()):
+        try:
+            parsed = pd.to_datetime(sample, format=fmt, errors="coerce")
+        except (ValueError, TypeError):
+            continue
+        if parsed.notna().all():
+            return fmt
+    return None
+
+
+def _to_datetime(series, fmt):
+    """
+    Parse a column with one format.
+
+    Non-ISO formats are parsed value by value, so when the sampled values
+    repeat, each distinct value is parsed once and mapped back to the rows.
+    """
+    sample = series.iloc[:: max(1, len(series) // DATETIME_SAMPLE_SIZE)].dropna()
+    if not sample.duplicated().any():
+        return pd.to_datetime(series, format=fmt, errors="coerce")
+
+    codes, uniques = pd.factorize(series)
+    parsed = pd.DatetimeIndex(pd.to_datetime(uniques, format=fmt, errors="coerce"))
+    return pd.Series(
+        parsed.take(codes, allow_fill=True, fill_value=pd.NaT),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def parse_datetime_columns(df, formats=None):
+    """
+    Parse the datetime columns of a DataFrame into ``datetime64`` columns.
+
+    Without ``formats``, the format of every string column is detected with
+    :func:`detect_datetime_format`, and a column is only converted if all of
+    its values parse. With ``formats``, the given columns are parsed with
+    their format, and values that do not parse become ``NaT``.
+
+    The formats of the parsed columns are kept in ``df.attrs["datetime_formats"]``.
+
+    Args:
+        df (pd.DataFrame): The dataset. It is not modified.
+        formats (dict, optional): Column name mapped to its known format.
+
+    Returns:
+        pd.DataFrame: The dataset with its datetime columns parsed.
+    """
+    known = formats is not None
+    if formats is None:
+        formats = {column: detect_datetime_format(df[column]) for column in df.columns}
+    formats = {
+        column: fmt
+        for column, fmt in formats.items()
+        if fmt and column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column])
+    }
+
+    parsed_columns = {}
+    for column, fmt in formats.items():
+        try:
+            parsed = _to_datetime(df[column], fmt)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Could not parse column '{column}' as dates: {e}")
+            continue
+        if not known and parsed.isna().sum() > df[column].isna().sum():
+            # Some values outside the sample do not follow the format
+            continue
+        parsed_columns[column] = parsed
+
+    df = df.copy(deep=False)
+    for column, values in parsed_columns.items():
+        df[column] = values
+    if parsed_columns:
+        logger.info(f"Parsed datetime columns: {list(parsed_columns)}")
+    df.attrs[FORMATS_ATTR] = {
+        **df.attrs.get(FORMATS_ATTR, {}),
+        **{column: formats[column] for column in parsed_columns},
+    }
+    return df
@@ -1,7 +1,7 @@
 import streamlit as st
 from utils import (
-    read_uploaded_file,
-    clean_dataframe,
+    load_uploaded_dataset,
+    clean_loaded_dataset,
     display_dataframe_overview,
 )
 
@@ -98,28 +98,29 @@ def home_page():
 
     # Dataset upload
     st.header("📂 Upload Your Dataset")
-    st.write("Drag and drop a file or select one using the file picker below:")
-    uploaded_file = st.file_uploader("Choose a file", type=["csv", "xlsx"])
+    st.write("Drag and drop files, or a zip archive of them, or select them using the file picker below:")
+    uploaded_files = st.file_uploader(
+        "Choose files, or a zip archive of them",
+        type=["csv", "xlsx", "zip"],
+        accept_multiple_files=True,
+    )
 
-    if uploaded_file:
+    if uploaded_files:
         # Initialize session state for storing DataFrames if not exists
         if "raw_df" not in st.session_state:
             st.session_state.raw_df = None
         if "cleaned_df" not in st.session_state:
             st.session_state.cleaned_df = None
 
-        # Read the file if it hasn't been read yet
-        if st.session_state.raw_df is None:
-            st.session_state.raw_df = read_uploaded_file(uploaded_file)
+        # Read the file, or only its changed rows if it is a new version
+        load_uploaded_dataset(uploaded_files)
 
         if st.session_state.raw_df is not None:
             col1, col2 = st.columns([1, 2])
 
             with col1:
                 if st.button("🧹 Clean Data"):
-                    st.session_state.cleaned_df = clean_dataframe(
-                        st.session_state.raw_df
-                    )
+                    clean_loaded_dataset()
                     st.success("Data cleaned successfully!")
 
             with col2:
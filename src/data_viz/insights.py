@@ -7,6 +7,7 @@ def get_insights_page():
 
     The page allows users to:
     - Enter their API key for the LLM service
+    - Analyze charts rendered on the Data Visualization page
     - Upload PNG images
     - View the uploaded image
     - Get AI-generated insights about the visualization
@@ -32,6 +33,8 @@ def get_insights_page():
         st.warning("⚠️ Please enter a valid API key to proceed.")
         return
 
+    stored_figures_section()
+
     uploaded_image = st.file_uploader("📂 Upload an image", type=["jpg", "jpeg", "png"])
 
     if uploaded_image:
@@ -46,4 +49,37 @@ def get_insights_page():
                 st.subheader("🔍 Insights")
                 st.write(insights)
             except Exception as e:
-                st.error(f"⚠️ Error generating insights: {e}")
\ No newline at end of file
+                st.error(f"⚠️ Error generating insights: {e}")
+
+@st.fragment
+def stored_figures_section():
+    """
+    Renders the charts kept in the session figure store with an analyze action.
+
+    Each chart rendered on the Data Visualization page is stored as PNG bytes,
+    so clicking "Analyze this chart" sends those bytes straight to
+    ``get_insights`` without exporting and re-uploading the plot. Runs as a
+    fragment so analyzing a chart does not rerun the rest of the page.
+
+    Returns:
+        None. Renders the page content directly using Streamlit.
+    """
+    figure_store = st.session_state.get("figure_store", [])
+    if not figure_store:
+        return
+
+    st.header("🖼️ Charts from this session")
+    for entry in reversed(figure_store):
+        st.image(entry["image"], caption=entry["prompt"], use_container_width=True)
+
+        if st.button("🔍 Analyze this chart", key=f"analyze_figure_{entry['id']}"):
+            with st.spinner("⏳ Generating insights..."):
+                entry["insights"] = get_insights(
+                    entry["image"],
+                    API_KEY=st.session_state.api_key,
+                    media_type=entry["media_type"],
+                )
+
+        if entry["insights"]:
+            st.subheader("🔍 Insights")
+            st.write(entry["insights"])
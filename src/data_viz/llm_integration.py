@@ -4,9 +4,12 @@ import logging
 import pandas as pd
 from dotenv import load_dotenv
 import base64
+import re
 from typing import Union
 from io import BytesIO
 
+from aggregations import HELPERS_GUIDELINE
+
 # Load environment variables
 load_dotenv()
 
@@ -23,9 +26,33 @@ logger = logging.getLogger(__name__)
 #client = anthropic.Anthropic(api_key=API_KEY)
 
 
-def call_llm_for_viz(data: pd.DataFrame, user_request: str,API_KEY:str) -> str:
+def describe_dataset(data: pd.DataFrame) -> str:
+    """
+    Describes the dataset structure sent to the LLM with visualization requests.
+
+    Args:
+        data (pd.DataFrame): The dataset.
+
+    Returns:
+        str: The column names and types, and the summary statistics of every column.
+    """
+    return f"""
+        Column Names and Types:
+        {data.dtypes.to_string()}
+
+        Dataset Description:
+        {data.describe(include='all').to_string()}
+        """
+
+
+def call_llm_for_viz(
+    data: pd.DataFrame, user_request: str, API_KEY: str, dataset_info: str = None
+) -> str:
     """
     Calls the LLM to generate Python visualization code based on dataset structure.
+
+    The dataset description is computed with :func:`describe_dataset` unless
+    ``dataset_info`` is given, so it can be computed once per dataset.
     """
     client = anthropic.Anthropic(api_key=API_KEY)
 
@@ -33,13 +60,8 @@ def call_llm_for_viz(data: pd.DataFrame, user_request: str,API_KEY:str) -> str:
         logger.error("❌ Empty DataFrame provided for visualization")
         return "Error: Empty DataFrame provided"
     else:
-        dataset_info = f"""
-        Column Names and Types:
-        {data.dtypes.to_string()}
-
-        Dataset Description:
-        {data.describe(include='all').to_string()}
-        """
+        if dataset_info is None:
+            dataset_info = describe_dataset(data)
 
         llm_prompt = f"""
         You are an expert in Python data visualization. Given the dataset structure below, generate an optimal visualization 
@@ -58,6 +80,9 @@ def call_llm_for_viz(data: pd.DataFrame, user_request: str,API_KEY:str) -> str:
         - The visualization should be relevant to the dataset's structure.
         - If necessary, infer numerical, categorical, or time-based trends.
         - Use directly the df variable in the environment to access the dataset. don't redefine it.
+        - Use vectorized pandas operations. Don't use iterrows, itertuples, apply with axis=1 or loops over rows.
+        - Date columns are already parsed as datetime64. Don't convert them again with pd.to_datetime.
+        {HELPERS_GUIDELINE}
 
         Provide **only** the Python code output.
         """
@@ -73,13 +98,76 @@ def call_llm_for_viz(data: pd.DataFrame, user_request: str,API_KEY:str) -> str:
         return response.content[0].text
 
 
-def get_insights(image_uploaded: Union[bytes, "BytesIO"], API_KEY: str) -> str:
+def extract_python_code(response):
+    """
+    Extract the Python code from an LLM response.
+
+    Args:
+        response (str): The LLM response, with or without a ```python block.
+
+    Returns:
+        str: The code inside the first ```python block, or the whole response.
+    """
+    match = re.search(r"```python\n(.*?)\n```", response, re.DOTALL)
+    if match:
+        return match.group(1)
+    return response
+
+
+def call_llm_for_vectorized_code(code: str, issues: list, API_KEY: str) -> str:
+    """
+    Calls the LLM to rewrite visualization code without row-wise pandas patterns.
+
+    Args:
+        code (str): The generated visualization code.
+        issues (list): Descriptions of the row-wise patterns found in the code.
+        API_KEY (str): The API key for the Anthropic service.
+
+    Returns:
+        str: The LLM response containing the vectorized code.
+    """
+    client = anthropic.Anthropic(api_key=API_KEY)
+
+    issues_list = "\n".join(f"- {issue}" for issue in issues)
+    llm_prompt = f"""
+        You are an expert in pandas performance. The visualization code below runs on a dataset
+        with millions of rows and contains row-wise patterns that are too slow:
+        {issues_list}
+
+        Code:
+        {code}
+
+        Guidelines:
+        - Rewrite the code using vectorized pandas or numpy operations only.
+        - Do not use iterrows, itertuples, apply with axis=1 or Python loops over rows.
+        - Keep the same visualization and the same libraries.
+        - Use directly the df variable in the environment to access the dataset. don't redefine it.
+
+        Provide **only** the Python code output.
+        """
+
+    logger.info("Calling LLM for vectorized code generation")
+
+    response = client.messages.create(
+        model="claude-3-5-sonnet-20241022",
+        max_tokens=8000,
+        messages=[{"role": "user", "content": llm_prompt}],
+    )
+
+    return response.content[0].text
+
+
+def get_insights(
+    image_uploaded: Union[bytes, "BytesIO"], API_KEY: str, media_type: str = None
+) -> str:
     """
     Analyze an uploaded image using LLM to generate insights about the visualization.
     
     Args:
         image_uploaded (Union[bytes, BytesIO]): The uploaded image file in bytes or BytesIO format.
+            Charts kept in the session figure store are passed here directly as PNG bytes.
         API_KEY (str): The API key for the Anthropic service.
+        media_type (str, optional): The image media type. Detected from the file content when omitted.
     
     Returns:
         str: Markdown-formatted string containing key insights about the visualization.
@@ -107,7 +195,8 @@ def get_insights(image_uploaded: Union[bytes, "BytesIO"], API_KEY: str) -> str:
         image_base64 = base64.b64encode(image_data).decode("utf-8")
 
         # Determine the media type (PNG or JPEG) based on the file content
-        media_type = "image/png" if image_data.startswith(b"\x89PNG") else "image/jpeg"
+        if media_type is None:
+            media_type = "image/png" if image_data.startswith(b"\x89PNG") else "image/jpeg"
 
         # Define the prompt for Claude
         prompt = """
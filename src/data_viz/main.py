@@ -11,6 +11,7 @@ import streamlit as st
 from home import home_page, explore_more
 from chat import data_viz_chat_page
 from insights import get_insights_page
+from utils import install_figure_lock
 
 
 def main():
@@ -21,6 +22,9 @@ def main():
     Returns:
         None. Renders the application directly using Streamlit.
     """
+    # Keep Streamlit from closing the figures other sessions are drawing
+    install_figure_lock()
+
     # Streamlit UI
     st.set_page_config(page_title="📊 AI-Powered Data Visualization", layout="wide")
 
@@ -0,0 +1,558 @@
+"""
+Headless pipeline for the AI-Powered Data Visualization application.
+This module runs the same stages as the Streamlit pages without any UI calls,
+so they can be reused by batch jobs:
+- Ingest a CSV or Excel file, parsing its date columns, or several files and
+  zip archives of them as one dataset
+- Clean the dataset, optionally replaying a fitted cleaning plan
+- Profile the dataset
+- Generate visualization code with the LLM and rewrite slow pandas patterns
+- Execute the code and capture the rendered figures
+- Get insights on the rendered figures
+
+It can also be run as a command line tool over a directory of datasets::
+
+    python src/data_viz/pipeline.py data/ --workers 4 --output reports/
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+from aggregations import Aggregations
+from cleaning import CleaningPlan, CleaningReport, apply_cleaning_plan, clean
+from code_analysis import modifies_dataset, prepare_generated_code, split_plotting_code
+from datetimes import FORMATS_ATTR, parse_datetime_columns
+from llm_integration import call_llm_for_viz, extract_python_code, get_insights
+
+logger = logging.getLogger(__name__)
+
+TABLE_EXTENSIONS = (".csv", ".xls", ".xlsx")
+SUPPORTED_EXTENSIONS = TABLE_EXTENSIONS + (".zip",)
+
+# pyplot keeps its figures in process-wide state, shared by every Streamlit
+# session thread: hold this lock from running plotting code to capturing figures.
+# It is reentrant so that code holding it can close its own figures.
+FIGURE_LOCK = threading.RLock()
+
+
+class UnsupportedFileFormatError(ValueError):
+    """Raised when a dataset is neither a CSV nor an Excel file, nor a zip archive of them."""
+
+
+@dataclass
+class DatasetReport:
+    """
+    Result of running the pipeline over one dataset.
+
+    Attributes:
+        source (str): Path of the dataset file.
+        cleaning (CleaningReport): Changes made while cleaning the dataset.
+        profile (dict): Shape, dtypes, missing values and summary statistics.
+        code (str): Visualization code generated by the LLM, if requested.
+        code_issues (list): Slow patterns found in the generated code.
+        figures (list): PNG-encoded figures rendered by the generated code.
+        insights (list): Insights generated for each figure, if requested.
+        errors (list): Error messages of the stages that failed.
+        timings (dict): Duration of each stage in seconds.
+    """
+
+    source: str
+    cleaning: CleaningReport = None
+    profile: dict = None
+    code: str = None
+    code_issues: list = field(default_factory=list)
+    figures: list = field(default_factory=list)
+    insights: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        """
+        Convert the report to a JSON-serializable dictionary.
+
+        Figures are replaced by their count since they are written separately.
+        """
+        report = asdict(self)
+        report["figures"] = len(self.figures)
+        return report
+
+
+def ingest(source, name=None):
+    """
+    Read a CSV or Excel file into a pandas DataFrame.
+
+    Date columns are detected and parsed into ``datetime64`` columns with
+    :func:`parse_datetime_columns`. A zip archive is read as one dataset
+    with :func:`ingest_many`.
+
+    Args:
+        source: Path or file-like object of the dataset.
+        name (str, optional): File name used to detect the format. Defaults to ``source``.
+
+    Returns:
+        pd.DataFrame: The dataset.
+
+    Raises:
+        UnsupportedFileFormatError: If the file is neither a CSV nor an Excel
+            file, nor a zip archive of them.
+    """
+    name = str(source if name is None else name)
+    if name.endswith(".csv"):
+        df = pd.read_csv(source)
+    elif name.endswith((".xls", ".xlsx")):
+        df = pd.read_excel(source)
+    elif name.endswith(".zip"):
+        return ingest_many([source], [name])
+    else:
+        raise UnsupportedFileFormatError(
+            "Unsupported file format. Please upload a CSV or Excel file, or a zip archive of them."
+        )
+    return parse_datetime_columns(df)
+
+
+def _read_member(archive, member):
+    """Ingest one file of a zip archive."""
+    with archive.open(member) as f:
+        if member.endswith(".csv"):
+            return ingest(f, member)
+        # Excel readers seek back and forth, which is slow on compressed streams
+        return ingest(BytesIO(f.read()), member)
+
+
+def _table_files(sources, names, stack):
+    """List the ``(reader, source, name)`` of every table file, opening zip archives."""
+    files = []
+    for source, name in zip(sources, names):
+        name = str(name)
+        if not name.endswith(".zip"):
+            files.append((ingest, source, name))
+            continue
+        archive = stack.enter_context(zipfile.ZipFile(source))
+        members = [
+            member
+            for member in archive.namelist()
+            if member.endswith(TABLE_EXTENSIONS) and not member.startswith("__MACOSX/")
+        ]
+        if not members:
+            raise UnsupportedFileFormatError(f"The zip archive {name} contains no CSV or Excel file.")
+        files.extend((_read_member, archive, member) for member in sorted(members))
+    return files
+
+
+def _as_text(series, fmt=None):
+    """Convert values to strings, writing dates back in their source format when known."""
+    if fmt is not None and pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime(fmt).where(series.notna())
+    return series.astype("str").where(series.notna())
+
+
+def _reconcile_column(values, fmt=None):
+    """
+    Convert the values of one column, read from several files, to a common dtype.
+
+    A column holding dates or numbers in some files is converted to dates or
+    numbers in the others, when no value is lost doing so. Otherwise every
+    part is converted to strings, with dates in their source format ``fmt``
+    when it is known. Parts without any value take the dtype of
+    the others.
+    """
+    has_values = [series.notna().any() for series in values]
+    present = [series for series, filled in zip(values, has_values) if filled]
+    if not present:
+        return values
+    if any(pd.api.types.is_datetime64_any_dtype(series) for series in present):
+        is_target = pd.api.types.is_datetime64_any_dtype
+        convert = lambda series: pd.to_datetime(series, format=fmt, errors="coerce")  # noqa: E731
+    elif any(
+        pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        for series in present
+    ):
+        is_target = pd.api.types.is_numeric_dtype
+        convert = lambda series: pd.to_numeric(series, errors="coerce")  # noqa: E731
+    else:
+        # Text, booleans and categories are combined by pd.concat
+        is_target, convert = None, None
+
+    converted = {}
+    for index, series in enumerate(values):
+        if is_target is None or not has_values[index] or is_target(series):
+            continue
+        try:
+            result = convert(series)
+        except (ValueError, TypeError):
+            result = None
+        if result is None or result.isna().sum() > series.isna().sum():
+            return [_as_text(series, fmt) for series in values]
+        converted[index] = result
+
+    values = [converted.get(index, series) for index, series in enumerate(values)]
+    dtype = present[0].dtype if is_target is None else next(
+        series.dtype for series, filled in zip(values, has_values) if filled
+    )
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        # Missing values cannot be held by these dtypes
+        return values
+    return [
+        series if filled else series.astype(dtype) for series, filled in zip(values, has_values)
+    ]
+
+
+def reconcile_schemas(frames):
+    """
+    Give each column the same dtype in every DataFrame read from one dataset.
+
+    Files of the same dataset can be read with different dtypes, when a
+    column is empty in one of them or holds a malformed value, or when its
+    dates were only detected in some of them. Columns are matched by name,
+    so files may order them differently or miss some of them.
+
+    Args:
+        frames (list[pd.DataFrame]): The parts of the dataset.
+
+    Returns:
+        list[pd.DataFrame]: The parts, sharing their unchanged columns with
+        ``frames``.
+    """
+    formats = {}
+    for df in frames:
+        for column, fmt in df.attrs.get(FORMATS_ATTR, {}).items():
+            formats.setdefault(column, fmt)
+
+    columns = list(dict.fromkeys(column for df in frames for column in df.columns))
+    reconciled = [df.copy(deep=False) for df in frames]
+    for column in columns:
+        holders = [df for df in reconciled if column in df.columns]
+        if len({str(df[column].dtype) for df in holders}) < 2:
+            continue
+        values = _reconcile_column([df[column] for df in holders], formats.get(column))
+        for df, series in zip(holders, values):
+            if series is not df[column]:
+                df[column] = series
+    return reconciled
+
+
+def ingest_many(sources, names=None, workers=None):
+    """
+    Read several CSV or Excel files, and the files of zip archives, as one dataset.
+
+    The files are parsed concurrently on a thread pool, as the CSV parser
+    releases the GIL while reading. Their schemas are reconciled with
+    :func:`reconcile_schemas`, then they are concatenated once, in the order
+    of ``sources``, with the files of an archive sorted by name.
+
+    Args:
+        sources (list): Paths or file-like objects of the files.
+        names (list, optional): File names used to detect the formats. Defaults to ``sources``.
+        workers (int, optional): Number of threads parsing the files. Defaults to the CPU count.
+
+    Returns:
+        pd.DataFrame: The dataset, with the date formats of every file in
+        ``df.attrs["datetime_formats"]``.
+
+    Raises:
+        UnsupportedFileFormatError: If a file is neither a CSV nor an Excel
+            file, nor a zip archive of them.
+    """
+    names = sources if names is None else names
+    with ExitStack() as stack:
+        files = _table_files(sources, names, stack)
+        if len(files) == 1:
+            reader, source, name = files[0]
+            return reader(source, name)
+        with ThreadPoolExecutor(
+            max_workers=min(len(files), workers or os.cpu_count() or 1),
+            thread_name_prefix="ingest",
+        ) as executor:
+            frames = list(executor.map(lambda file: file[0](*file[1:]), files))
+
+    frames = reconcile_schemas(frames)
+    formats = {}
+    for df in frames:
+        for column, fmt in df.attrs.get(FORMATS_ATTR, {}).items():
+            formats.setdefault(column, fmt)
+    df = pd.concat(frames, ignore_index=True)
+    df.attrs[FORMATS_ATTR] = {
+        column: fmt
+        for column, fmt in formats.items()
+        if pd.api.types.is_datetime64_any_dtype(df[column])
+    }
+    logger.info(f"Ingested {len(frames)} files into {len(df)} rows")
+    return df
+
+
+def profile(df):
+    """
+    Build a JSON-serializable profile of the DataFrame.
+
+    Args:
+        df (pd.DataFrame): The dataset to profile.
+
+    Returns:
+        dict: Row and column counts, dtypes, missing values per column and
+        summary statistics.
+    """
+    return {
+        "rows": len(df),
+        "columns": len(df.columns),
+        "dtypes": {column: str(dtype) for column, dtype in df.dtypes.items()},
+        "missing": {column: int(count) for column, count in df.isnull().sum().items()},
+        "summary": json.loads(df.describe(include="all").to_json()),
+    }
+
+
+def capture_figures(namespace, export_errors=None):
+    """
+    Encode every figure rendered by generated visualization code as PNG bytes.
+
+    Open matplotlib figures are saved and closed so they do not leak into the
+    next run. Plotly figures bound to a name in ``namespace`` are exported
+    too when a static image engine, such as kaleido, is available.
+
+    Args:
+        namespace (dict): Namespace in which the generated code was executed.
+        export_errors (list, optional): Receives the error of every Plotly
+            figure that could not be exported, so it can be reported.
+
+    Returns:
+        list[bytes]: PNG-encoded images, one per rendered figure.
+    """
+    images = []
+
+    try:
+        import matplotlib.pyplot as plt
+
+        for num in plt.get_fignums():
+            buffer = BytesIO()
+            plt.figure(num).savefig(buffer, format="png", bbox_inches="tight")
+            images.append(buffer.getvalue())
+        plt.close("all")
+    except ImportError:
+        pass
+
+    try:
+        import plotly.graph_objects as go
+
+        for value in namespace.values():
+            if isinstance(value, go.Figure):
+                try:
+                    images.append(value.to_image(format="png"))
+                except Exception as e:
+                    logger.warning(f"Could not export plotly figure: {e}")
+                    if export_errors is not None:
+                        export_errors.append(e)
+    except ImportError:
+        pass
+
+    return images
+
+
+def run_generated_code(code, namespace, export_errors=None):
+    """
+    Execute generated visualization code and capture the figures it renders.
+
+    ``FIGURE_LOCK`` is only held from the first statement that may use
+    pyplot until the figures are captured, so the data preparation of
+    several sessions runs concurrently.
+
+    Args:
+        code (str): The Python code.
+        namespace (dict): Namespace the code is executed in.
+        export_errors (list, optional): Receives the error of every figure
+            that could not be captured, see :func:`capture_figures`.
+
+    Returns:
+        list[bytes]: PNG-encoded figures rendered by the code.
+    """
+    preparation, plotting = split_plotting_code(code)
+    exec(preparation, namespace)
+    with FIGURE_LOCK:
+        exec(plotting, namespace)
+        return capture_figures(namespace, export_errors)
+
+
+def execute_code(code, df):
+    """
+    Execute generated visualization code against a DataFrame.
+
+    The code can call the memoized aggregation helpers of :class:`Aggregations`.
+
+    Args:
+        code (str): The Python code, referring to the dataset as ``df``.
+        df (pd.DataFrame): The dataset. It is not modified.
+
+    Returns:
+        list[bytes]: PNG-encoded figures rendered by the code.
+    """
+    namespace = Aggregations(df).namespace(modifies_dataset(code))
+    return run_generated_code(code, namespace)
+
+
+def run_pipeline(path, request=None, api_key=None, insights=False, plan=None):
+    """
+    Run every pipeline stage over one dataset.
+
+    A failing stage is recorded in the report errors and the stages that
+    depend on it are skipped.
+
+    Args:
+        path (str): Path of the dataset file.
+        request (str, optional): Visualization request sent to the LLM. Code
+            generation, execution and insights are skipped when omitted.
+        api_key (str, optional): Anthropic API key. Defaults to the
+            ``ANTHROPIC_API_KEY`` environment variable.
+        insights (bool): Whether to get insights on the rendered figures.
+        plan (CleaningPlan, optional): Fitted cleaning plan replayed instead of
+            deriving the cleaning rules from the dataset.
+
+    Returns:
+        DatasetReport: The structured report for the dataset.
+    """
+    report = DatasetReport(source=str(path))
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+
+    def stage(name, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        except Exception as e:
+            report.errors.append(f"{name}: {e}")
+            logger.error(f"❌ {name} failed for {path}: {e}")
+            return None
+        finally:
+            report.timings[name] = time.perf_counter() - start
+
+    df = stage("ingest", ingest, path)
+    if df is None:
+        return report
+
+    if plan is None:
+        cleaned = stage("clean", clean, df)
+    else:
+        cleaned = stage("clean", apply_cleaning_plan, df, plan)
+    if cleaned is None:
+        return report
+    df, report.cleaning = cleaned
+
+    report.profile = stage("profile", profile, df)
+
+    if not request:
+        return report
+
+    response = stage("generate", call_llm_for_viz, df, request, api_key)
+    if response is None:
+        return report
+    report.code = extract_python_code(response)
+
+    analysis = stage("analyze", prepare_generated_code, report.code, len(df), api_key)
+    if analysis is None:
+        return report
+    report.code = analysis.code
+    report.code_issues = [asdict(issue) for issue in analysis.issues]
+
+    report.figures = stage("execute", execute_code, report.code, df) or []
+
+    if insights:
+        for image in report.figures:
+            report.insights.append(
+                stage("insights", get_insights, image, api_key, "image/png")
+            )
+
+    return report
+
+
+def run_batch(paths, workers=None, **kwargs):
+    """
+    Run the pipeline over several datasets on a process pool.
+
+    Args:
+        paths (list): Paths of the dataset files.
+        workers (int, optional): Number of worker processes. Defaults to the CPU count.
+        **kwargs: Keyword arguments passed to :func:`run_pipeline`.
+
+    Returns:
+        list[DatasetReport]: One report per dataset, in the order of ``paths``.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_pipeline, path, **kwargs) for path in paths]
+        return [future.result() for future in futures]
+
+
+def write_report(report, output_dir):
+    """
+    Write a dataset report as JSON, and its figures as PNG files.
+
+    Args:
+        report (DatasetReport): The report to write.
+        output_dir (Path): Directory receiving the files.
+    """
+    stem = Path(report.source).stem
+    with open(output_dir / f"{stem}.json", "w") as f:
+        json.dump(report.to_dict(), f, indent=2, default=str)
+    for index, image in enumerate(report.figures, start=1):
+        (output_dir / f"{stem}_figure_{index}.png").write_bytes(image)
+
+
+def main(argv=None):
+    """
+    Command line entry point running the pipeline over a directory of datasets.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to ``sys.argv``.
+
+    Returns:
+        int: Exit status, 1 if any dataset reported an error.
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the DataVizQA pipeline over a directory of datasets."
+    )
+    parser.add_argument("directory", type=Path, help="Directory containing CSV or Excel files, or zip archives of them.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--request", help="Visualization request sent to the LLM for every dataset.")
+    parser.add_argument("--insights", action="store_true", help="Get insights on the rendered figures.")
+    parser.add_argument("--plan", type=Path, help="Cleaning plan written by 'cleaning.py fit'.")
+    parser.add_argument("--output", type=Path, default=Path("reports"), help="Directory receiving the reports.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    paths = sorted(
+        path for path in args.directory.iterdir() if path.suffix in SUPPORTED_EXTENSIONS
+    )
+    args.output.mkdir(parents=True, exist_ok=True)
+
+    plan = CleaningPlan.load(args.plan) if args.plan else None
+    reports = run_batch(
+        paths,
+        workers=args.workers,
+        request=args.request,
+        insights=args.insights,
+        plan=plan,
+    )
+    for report in reports:
+        write_report(report, args.output)
+        status = "failed" if report.errors else "ok"
+        logger.info(f"{report.source}: {status} ({sum(report.timings.values()):.2f}s)")
+
+    return 1 if any(report.errors for report in reports) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
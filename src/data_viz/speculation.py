@@ -0,0 +1,231 @@
+"""
+Speculative work started in the background as soon as a dataset is loaded,
+so that the first visualization requests do not wait for it:
+- Describe the dataset for the visualization prompt
+- Import the plotting libraries used by generated code
+- Generate and analyze with the LLM the code of a few charts, suggested
+  from the column types
+
+Speculative work runs on a small thread pool shared by every session, and
+is capped to ``MAX_SPECULATIVE_CHARTS`` suggestions per dataset.
+"""
+
+import importlib
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from code_analysis import CodeAnalysis, prepare_generated_code
+from llm_integration import call_llm_for_viz, describe_dataset, extract_python_code
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of charts generated speculatively for one dataset
+MAX_SPECULATIVE_CHARTS = 3
+
+# Seconds between two refreshes of the suggestions while their code is generated
+SUGGESTIONS_REFRESH = 2
+
+# Threads running speculative work, shared by every session
+SPECULATION_WORKERS = 2
+
+# Columns with more distinct values than this are not suggested as categories
+MAX_CATEGORIES = 30
+
+# Plotting libraries imported by generated code, slow to import the first time
+PLOTTING_MODULES = ("seaborn", "plotly.express")
+
+_executor = ThreadPoolExecutor(
+    max_workers=SPECULATION_WORKERS, thread_name_prefix="speculation"
+)
+
+
+@dataclass
+class Suggestion:
+    """
+    A visualization generated speculatively.
+
+    Attributes:
+        request (str): The suggested visualization request.
+        response (str): The LLM response to the request.
+        analysis (CodeAnalysis): The analysis of the generated code.
+    """
+
+    request: str
+    response: str
+    analysis: CodeAnalysis
+
+
+def normalize_request(request):
+    """Normalize the case and whitespace of a visualization request."""
+    return " ".join(request.lower().split())
+
+
+def suggest_requests(df, limit=MAX_SPECULATIVE_CHARTS):
+    """
+    Suggest common first visualization requests from the column types.
+
+    Args:
+        df (pd.DataFrame): The dataset.
+        limit (int): Maximum number of suggestions.
+
+    Returns:
+        list[str]: Visualization requests, the most common first.
+    """
+    if df.empty:
+        return []
+
+    numeric, categorical, temporal = [], [], []
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series):
+            categorical.append(column)
+        elif pd.api.types.is_numeric_dtype(series):
+            numeric.append(column)
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            temporal.append(column)
+        elif series.nunique() <= MAX_CATEGORIES:
+            categorical.append(column)
+
+    requests = []
+    if numeric:
+        requests.append(f"Show the distribution of {numeric[0]} with a histogram")
+    if categorical:
+        requests.append(f"Show a bar chart of the number of rows per {categorical[0]}")
+    if temporal and numeric:
+        requests.append(f"Show {numeric[0]} over {temporal[0]} with a line chart")
+    if len(numeric) > 1:
+        requests.append("Show a heatmap of the correlations between the numeric columns")
+    if categorical and numeric:
+        requests.append(f"Compare {numeric[0]} across {categorical[0]} with a box plot")
+    return requests[:limit]
+
+
+def warm_imports():
+    """Import the plotting libraries so generated code does not wait for them."""
+    for name in PLOTTING_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+class Speculation:
+    """
+    Background speculative work for one loaded dataset.
+
+    The suggested requests are computed right away from the column types,
+    which is cheap. The dataset description is computed on the shared
+    thread pool, then the code of each suggestion is generated there too.
+    Results are used by :meth:`dataset_info` and :meth:`lookup`: work that
+    is done or running is waited for, and work still queued is cancelled so
+    the caller runs it right away instead.
+
+    At most ``limit`` requests are suggested, and the code of the first
+    ``charts`` of them is generated, all of them by default.
+
+    Attributes:
+        df (pd.DataFrame): The dataset the work is done for.
+        requests (list[str]): The suggested visualization requests.
+        started (int): Number of suggestions whose generation started.
+    """
+
+    def __init__(self, df, api_key, limit=MAX_SPECULATIVE_CHARTS, charts=None):
+        self.df = df
+        self.requests = suggest_requests(df, limit)
+        self.started = 0
+        self._api_key = api_key
+        self._charts = limit if charts is None else charts
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._suggestions = {}
+        self._prepared = _executor.submit(self._prepare)
+        if not all(name in sys.modules for name in PLOTTING_MODULES):
+            _executor.submit(warm_imports)
+
+    def _prepare(self):
+        dataset_info = describe_dataset(self.df)
+        with self._lock:
+            if not self._cancelled:
+                for request in self.requests[: self._charts]:
+                    self._suggestions[normalize_request(request)] = _executor.submit(
+                        self._generate, request, dataset_info
+                    )
+        return dataset_info
+
+    def _generate(self, request, dataset_info):
+        with self._lock:
+            self.started += 1
+        response = call_llm_for_viz(
+            self.df, request, API_KEY=self._api_key, dataset_info=dataset_info
+        )
+        analysis = prepare_generated_code(
+            extract_python_code(response), len(self.df), API_KEY=self._api_key
+        )
+        logger.info(f"Speculative visualization ready: {request}")
+        return Suggestion(request, response, analysis)
+
+    @property
+    def pending(self):
+        """Whether the description or the code of a suggestion is still being generated."""
+        with self._lock:
+            futures = [self._prepared, *self._suggestions.values()]
+        return not all(future.done() for future in futures)
+
+    def ready(self, request):
+        """Return whether the suggestion for a request is generated."""
+        with self._lock:
+            future = self._suggestions.get(normalize_request(request))
+        return (
+            future is not None
+            and future.done()
+            and not future.cancelled()
+            and future.exception() is None
+        )
+
+    def _claim(self, future):
+        """Wait for a future unless it is still queued, in which case it is cancelled."""
+        if future is None or future.cancel():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning(f"Speculative work failed: {e}")
+            return None
+
+    def dataset_info(self):
+        """
+        Return the dataset description for the visualization prompt.
+
+        Returns:
+            str: The description, or None if it was not computed.
+        """
+        return self._claim(self._prepared)
+
+    def lookup(self, request):
+        """
+        Return the speculative result for a request.
+
+        Args:
+            request (str): The visualization request, compared to the
+                suggestions regardless of case and whitespace.
+
+        Returns:
+            Suggestion: The generated suggestion, or None if the request was
+            not suggested or its generation failed.
+        """
+        with self._lock:
+            future = self._suggestions.get(normalize_request(request))
+        return self._claim(future)
+
+    def cancel(self):
+        """Cancel the queued work, when the dataset is replaced."""
+        with self._lock:
+            self._cancelled = True
+            futures = [self._prepared, *self._suggestions.values()]
+        for future in futures:
+            future.cancel()
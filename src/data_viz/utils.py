@@ -1,26 +1,68 @@
+import logging
+import time
+from functools import wraps
+
+import matplotlib.pyplot as plt
 import streamlit as st
-import pandas as pd
+
+from cleaning import clean
+from pipeline import (
+    FIGURE_LOCK,
+    UnsupportedFileFormatError,
+    capture_figures,
+    ingest,
+    ingest_many,
+    run_generated_code,
+)
+from versioning import clean_version, start_version, update_version
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of rendered charts kept in the per-session figure store
+MAX_STORED_FIGURES = 10
+
+
+def install_figure_lock():
+    """
+    Make ``pyplot.close`` wait for the figure lock to be released.
+
+    Streamlit closes every pyplot figure at the end of each script run, from
+    the thread of the session whose run ended, which would otherwise discard
+    the figures another session is still drawing. Called by the app when it
+    starts; installing it again has no effect.
+    """
+    close = plt.close
+    if getattr(close, "waits_for_figure_lock", False):
+        return
+
+    @wraps(close)
+    def wrapper(*args, **kwargs):
+        with FIGURE_LOCK:
+            return close(*args, **kwargs)
+
+    wrapper.waits_for_figure_lock = True
+    plt.close = wrapper
 
 
 def read_uploaded_file(uploaded_file):
     """
     Read the uploaded file into a pandas DataFrame.
 
+    Several files, or a zip archive, are read concurrently as one dataset.
+
     Parameters:
-    uploaded_file: Streamlit UploadedFile object
+    uploaded_file: Streamlit UploadedFile object, or a list of them
 
     Returns:
     pd.DataFrame or None if error occurs
     """
     try:
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith((".xls", ".xlsx")):
-            df = pd.read_excel(uploaded_file)
-        else:
-            st.error("Unsupported file format. Please upload a CSV or Excel file.")
-            return None
-        return df
+        if isinstance(uploaded_file, list):
+            return ingest_many(uploaded_file, [file.name for file in uploaded_file])
+        return ingest(uploaded_file, uploaded_file.name)
+    except UnsupportedFileFormatError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Error reading file: {str(e)}")
         return None
@@ -28,7 +70,7 @@ def read_uploaded_file(uploaded_file):
 
 def clean_dataframe(df):
     """
-    Clean the input DataFrame.
+    Clean the input DataFrame and report the changes in the Streamlit UI.
 
     Parameters:
     df: pandas DataFrame
@@ -36,45 +78,74 @@ def clean_dataframe(df):
     Returns:
     pd.DataFrame: Cleaned DataFrame
     """
-    # Make a copy to avoid modifying original data
-    df_cleaned = df.copy()
-
-    # Clean column names
-    df_cleaned.columns = df_cleaned.columns.str.strip()
-    df_cleaned.columns = df_cleaned.columns.str.lower()
-    df_cleaned.columns = df_cleaned.columns.str.replace(r"\s+", "_", regex=True)
-    df_cleaned.columns = df_cleaned.columns.str.replace(r"[^\w\s]", "", regex=True)
-
-    # Remove duplicate rows
-    initial_rows = len(df_cleaned)
-    df_cleaned = df_cleaned.drop_duplicates()
-    if len(df_cleaned) < initial_rows:
-        st.warning(f"Removed {initial_rows - len(df_cleaned)} duplicate rows")
-
-    # Handle missing values
-    for column in df_cleaned.columns:
-        missing_count = df_cleaned[column].isnull().sum()
-        if missing_count > 0:
-            if pd.api.types.is_numeric_dtype(df_cleaned[column]):
-                df_cleaned[column] = df_cleaned[column].fillna(
-                    df_cleaned[column].median()
-                )
-            else:
-                if not df_cleaned[column].mode().empty:
-                    df_cleaned[column] = df_cleaned[column].fillna(
-                        df_cleaned[column].mode()[0]
-                    )
-                else:
-                    df_cleaned[column] = df_cleaned[column].fillna("")
-            st.info(f"Filled {missing_count} missing values in column '{column}'")
-
-    # Strip whitespace from string columns
-    for column in df_cleaned.select_dtypes(include=["object"]):
-        df_cleaned[column] = df_cleaned[column].str.strip()
-
+    df_cleaned, report = clean(df)
+    display_cleaning_report(report)
     return df_cleaned
 
 
+def display_cleaning_report(report):
+    """
+    Report the changes made while cleaning a dataset in the Streamlit UI.
+
+    Parameters:
+    report: CleaningReport
+    """
+    if report.duplicates_removed:
+        st.warning(f"Removed {report.duplicates_removed} duplicate rows")
+    for column, missing_count in report.filled_missing.items():
+        st.info(f"Filled {missing_count} missing values in column '{column}'")
+
+
+def load_uploaded_dataset(uploaded_files):
+    """
+    Load the uploaded files into the session as one dataset, once per upload.
+
+    When the dataset is a new version of the loaded one (same name apart
+    from digits, same columns), only the rows that changed are cleaned and
+    profiled again. The name of a dataset uploaded as several files is the
+    first of their names. ``st.session_state.raw_df`` and
+    ``st.session_state.cleaned_df`` are kept in sync with the loaded version.
+
+    Parameters:
+    uploaded_files: list of Streamlit UploadedFile objects
+    """
+    file_id = ",".join(file.file_id for file in uploaded_files)
+    if st.session_state.get("dataset_file_id") == file_id:
+        return
+
+    df = read_uploaded_file(uploaded_files)
+    if df is None:
+        return
+    st.session_state.dataset_file_id = file_id
+
+    name = min(file.name for file in uploaded_files)
+    dataset = st.session_state.get("dataset")
+    diff = update_version(dataset, df, name) if dataset else None
+    if diff is None:
+        dataset = start_version(df, name)
+        st.session_state.dataset = dataset
+    else:
+        st.info(
+            f"🔄 Loaded version {dataset.version} of this dataset: {diff.added} rows added, "
+            f"{diff.removed} removed, {diff.unchanged} unchanged"
+        )
+
+    st.session_state.raw_df = dataset.raw
+    st.session_state.cleaned_df = dataset.cleaned
+
+
+def clean_loaded_dataset():
+    """
+    Clean the dataset loaded by :func:`load_uploaded_dataset` and report the changes.
+
+    The fitted cleaning plan is kept so that later versions of the dataset
+    only clean their new rows.
+    """
+    dataset = st.session_state.dataset
+    display_cleaning_report(clean_version(dataset))
+    st.session_state.cleaned_df = dataset.cleaned
+
+
 def display_dataframe_overview(df):
     """
     Display an overview of the DataFrame.
@@ -87,3 +158,58 @@ def display_dataframe_overview(df):
     st.write(f"**Columns:** {', '.join(df.columns)}")
     st.write("### 📋 First 5 Rows of the Dataset")
     st.dataframe(df.head())
+
+
+def store_figures(images, prompt):
+    """
+    Add rendered chart images to the per-session figure store.
+
+    The store lives in ``st.session_state.figure_store`` and keeps at most
+    ``MAX_STORED_FIGURES`` entries, dropping the oldest ones first.
+
+    Parameters:
+    images: list of PNG-encoded images
+    prompt: str, the user request that produced the charts
+    """
+    if "figure_store" not in st.session_state:
+        st.session_state.figure_store = []
+        st.session_state.figure_count = 0
+
+    for image in images:
+        st.session_state.figure_count += 1
+        st.session_state.figure_store.append(
+            {
+                "id": st.session_state.figure_count,
+                "image": image,
+                "media_type": "image/png",
+                "prompt": prompt,
+                "insights": None,
+            }
+        )
+
+    del st.session_state.figure_store[:-MAX_STORED_FIGURES]
+
+
+def timed_run(label):
+    """
+    Decorator logging how long each run of a page section takes.
+
+    Used on Streamlit fragments to measure the rerun cost of an interaction.
+
+    Parameters:
+    label: str, name of the section shown in the log message
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                logger.info(f"⏱️ {label} rendered in {elapsed_ms:.1f} ms")
+
+        return wrapper
+
+    return decorator
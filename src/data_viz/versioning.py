@@ -0,0 +1,392 @@
+"""
+Version-aware ingest for datasets uploaded again with a few rows changed.
+A dataset version keeps, next to the raw and cleaned DataFrames:
+- The lineage of the dataset, so a new upload of the same file is recognized
+- A hash of every raw row, so the rows added and removed by the new upload are
+  found without comparing values
+- The fitted cleaning plan and the dedup hash of every cleaned row, so only
+  the added rows are cleaned
+- Running profiles of the raw and cleaned data, updated with the added and
+  removed rows only
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cleaning import CleaningPlan, apply_cleaning_plan, fit_cleaning_plan
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RunningProfile:
+    """
+    Summary statistics that can be updated with added and removed rows.
+
+    Attributes:
+        rows (int): Number of rows.
+        missing (pd.Series): Missing values per column.
+        count (pd.Series): Non-missing values per numeric column.
+        mean (pd.Series): Mean per numeric column.
+        m2 (pd.Series): Sum of squared deviations from the mean per numeric
+            column, which gives the variance without the precision lost by
+            a sum of squares on large values.
+        minimum (pd.Series): Minimum per numeric column.
+        maximum (pd.Series): Maximum per numeric column.
+    """
+
+    rows: int
+    missing: pd.Series
+    count: pd.Series
+    mean: pd.Series
+    m2: pd.Series
+    minimum: pd.Series
+    maximum: pd.Series
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Compute the profile of a DataFrame.
+
+        Args:
+            df (pd.DataFrame): The data to profile.
+
+        Returns:
+            RunningProfile: The profile.
+        """
+        numeric = df.select_dtypes(include="number").astype("float64")
+        mean = numeric.mean()
+        return cls(
+            rows=len(df),
+            missing=df.isnull().sum(),
+            count=numeric.count(),
+            mean=mean,
+            m2=((numeric - mean) ** 2).sum(),
+            minimum=numeric.min(),
+            maximum=numeric.max(),
+        )
+
+    def update(self, added, removed, current):
+        """
+        Update the profile with the rows added to and removed from the data.
+
+        Counts, means and squared deviations are updated from the changed
+        rows only, with the parallel update of Chan et al. A minimum or
+        maximum is recomputed from ``current`` only when a removed row held
+        it. If the numeric columns changed, the profile is recomputed.
+
+        Args:
+            added (pd.DataFrame): The rows added to the data.
+            removed (pd.DataFrame): The rows removed from the data.
+            current (pd.DataFrame): The data after the update.
+        """
+        added_profile = RunningProfile.from_frame(added)
+        removed_profile = RunningProfile.from_frame(removed)
+        numeric_columns = list(current.select_dtypes(include="number").columns)
+        if list(self.count.index) != numeric_columns or any(
+            list(profile.count.index) != numeric_columns
+            for profile in (added_profile, removed_profile)
+        ):
+            self.__dict__.update(RunningProfile.from_frame(current).__dict__)
+            return
+
+        self.rows = len(current)
+        self.missing = self.missing + added_profile.missing - removed_profile.missing
+        moments = (self.count, self.mean, self.m2)
+        moments = _merge_moments(*moments, added_profile.count, added_profile.mean, added_profile.m2)
+        moments = _merge_moments(
+            *moments, -removed_profile.count, removed_profile.mean, -removed_profile.m2
+        )
+        self.count, self.mean, self.m2 = moments
+
+        stale = (removed_profile.minimum <= self.minimum) | (removed_profile.maximum >= self.maximum)
+        self.minimum = np.fmin(self.minimum, added_profile.minimum)
+        self.maximum = np.fmax(self.maximum, added_profile.maximum)
+        for column in stale[stale].index:
+            self.minimum[column] = current[column].min()
+            self.maximum[column] = current[column].max()
+
+    def describe(self):
+        """
+        Summary statistics of the numeric columns, laid out like ``describe()``.
+
+        Returns:
+            pd.DataFrame: Count, mean, standard deviation, minimum and maximum
+            of each numeric column.
+        """
+        variance = self.m2 / (self.count - 1)
+        return pd.DataFrame(
+            {
+                "count": self.count.astype("float64"),
+                "mean": self.mean,
+                "std": np.sqrt(variance.clip(lower=0)),
+                "min": self.minimum,
+                "max": self.maximum,
+            }
+        ).T
+
+
+def _merge_moments(count, mean, m2, other_count, other_mean, other_m2):
+    """
+    Merge the moments of two sets of values, per column.
+
+    Negative ``other_count`` and ``other_m2`` remove the other values from
+    the first set instead, which they must be part of.
+
+    Args:
+        count (pd.Series): Number of values of the first set.
+        mean (pd.Series): Mean of the first set, NaN when it is empty.
+        m2 (pd.Series): Sum of squared deviations of the first set.
+        other_count (pd.Series): Number of values of the other set.
+        other_mean (pd.Series): Mean of the other set, NaN when it is empty.
+        other_m2 (pd.Series): Sum of squared deviations of the other set.
+
+    Returns:
+        tuple[pd.Series, pd.Series, pd.Series]: The count, mean and sum of
+        squared deviations of the merged set.
+    """
+    merged_count = count + other_count
+    delta = other_mean.fillna(0) - mean.fillna(0)
+    weight = (other_count / merged_count.where(merged_count > 0)).fillna(0)
+    merged_mean = (mean.fillna(0) + delta * weight).where(merged_count > 0)
+    merged_m2 = m2 + other_m2 + delta**2 * count * weight
+    return merged_count, merged_mean, merged_m2.where(merged_count > 1, 0.0)
+
+
+@dataclass
+class VersionDiff:
+    """
+    Rows changed between two versions of a dataset.
+
+    Attributes:
+        added (int): Number of rows only in the new version.
+        removed (int): Number of rows only in the previous version.
+        unchanged (int): Number of rows in both versions.
+    """
+
+    added: int
+    removed: int
+    unchanged: int
+
+
+@dataclass
+class DatasetVersion:
+    """
+    The loaded version of a dataset and the state needed to update it.
+
+    Attributes:
+        lineage (str): Identifies the successive versions of a dataset.
+        raw (pd.DataFrame): The raw dataset.
+        raw_hashes (np.ndarray): Hash of every raw row.
+        raw_profile (RunningProfile): Profile of the raw dataset.
+        plan (CleaningPlan): Cleaning plan fitted on the first cleaned version.
+        cleaned (pd.DataFrame): The cleaned dataset, if it was cleaned.
+        cleaned_hashes (np.ndarray): Dedup hash of every cleaned row.
+        cleaned_profile (RunningProfile): Profile of the cleaned dataset.
+        version (int): Number of versions loaded in this lineage.
+    """
+
+    lineage: str
+    raw: pd.DataFrame
+    raw_hashes: np.ndarray
+    raw_profile: RunningProfile
+    plan: CleaningPlan = None
+    cleaned: pd.DataFrame = None
+    cleaned_hashes: np.ndarray = None
+    cleaned_profile: RunningProfile = None
+    version: int = 1
+
+
+def lineage_key(name, columns):
+    """
+    Identify a dataset across versions by its file name and columns.
+
+    Digits are removed from the file name, so ``sales_2025-01-02.csv`` and
+    ``sales_2025-01-03.csv`` with the same columns belong to the same lineage.
+
+    Args:
+        name (str): File name of the dataset.
+        columns (pd.Index): Column names of the dataset.
+
+    Returns:
+        str: The lineage key.
+    """
+    stem = re.sub(r"[\d_\-. ]+", "_", Path(name).stem).strip("_").lower()
+    return f"{stem}|{','.join(map(str, columns))}"
+
+
+def _last_occurrences(codes, excess):
+    """
+    Select the last ``excess[code]`` rows of every code.
+
+    Args:
+        codes (np.ndarray): Hash code of every row.
+        excess (np.ndarray): Number of rows to select per code.
+
+    Returns:
+        np.ndarray: Boolean mask of the selected rows.
+    """
+    candidates = np.flatnonzero(excess[codes] > 0)
+    candidate_codes = codes[candidates]
+    occurrence = pd.Series(candidate_codes).groupby(candidate_codes).cumcount().to_numpy()
+    counts = np.bincount(candidate_codes, minlength=len(excess))
+
+    mask = np.zeros(len(codes), dtype=bool)
+    mask[candidates[occurrence >= counts[candidate_codes] - excess[candidate_codes]]] = True
+    return mask
+
+
+def diff_rows(old_hashes, new_hashes):
+    """
+    Find the rows added and removed between two versions from their row hashes.
+
+    Both versions are factorized together once, and rows are compared by the
+    number of times each hash occurs, so repeated rows are counted correctly.
+
+    Args:
+        old_hashes (np.ndarray): Hash of every row of the previous version.
+        new_hashes (np.ndarray): Hash of every row of the new version.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Mask of the
+        rows added to the new version, mask of the rows removed from the
+        previous version, mask of the rows of the new version whose hash does
+        not occur in the previous version, and the hashes that only occur in
+        the previous version.
+    """
+    codes, uniques = pd.factorize(np.concatenate([old_hashes, new_hashes]))
+    old_codes, new_codes = codes[: len(old_hashes)], codes[len(old_hashes) :]
+    old_counts = np.bincount(old_codes, minlength=len(uniques))
+    new_counts = np.bincount(new_codes, minlength=len(uniques))
+
+    added = _last_occurrences(new_codes, np.clip(new_counts - old_counts, 0, None))
+    removed = _last_occurrences(old_codes, np.clip(old_counts - new_counts, 0, None))
+    unseen = old_counts[new_codes] == 0
+    vanished = uniques[(old_counts > 0) & (new_counts == 0)]
+    return added, removed, unseen, vanished
+
+
+def dedup_hashes(df, plan, hashes):
+    """
+    Hash the dedup columns of every raw row, as the cleaning plan does.
+
+    When the plan deduplicates on every column, the row hashes are reused.
+
+    Args:
+        df (pd.DataFrame): The raw data.
+        plan (CleaningPlan): The fitted cleaning plan.
+        hashes (np.ndarray): The hash of every raw row.
+
+    Returns:
+        np.ndarray: One uint64 hash per row.
+    """
+    renamed = df.rename(columns=plan.renames)
+    if list(renamed.columns) == plan.dedup_columns:
+        return hashes
+    return pd.util.hash_pandas_object(renamed[plan.dedup_columns], index=False).to_numpy()
+
+
+def start_version(df, name):
+    """
+    Start a new lineage with the first version of a dataset.
+
+    Args:
+        df (pd.DataFrame): The raw dataset.
+        name (str): File name of the dataset.
+
+    Returns:
+        DatasetVersion: The dataset version.
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return DatasetVersion(
+        lineage=lineage_key(name, df.columns),
+        raw=df,
+        raw_hashes=hashes,
+        raw_profile=RunningProfile.from_frame(df),
+    )
+
+
+def clean_version(state):
+    """
+    Clean the raw dataset of a version with a plan fitted on it.
+
+    Args:
+        state (DatasetVersion): The dataset version, updated in place.
+
+    Returns:
+        CleaningReport: Summary of the changes.
+    """
+    state.plan = fit_cleaning_plan(state.raw)
+    state.cleaned, report = apply_cleaning_plan(state.raw, state.plan)
+    hashes = dedup_hashes(state.raw, state.plan, state.raw_hashes)
+    state.cleaned_hashes = hashes[~pd.Series(hashes).duplicated().to_numpy()]
+    state.cleaned_profile = RunningProfile.from_frame(state.cleaned)
+    return report
+
+
+def update_version(state, df, name):
+    """
+    Update a dataset version with a new upload of the same dataset.
+
+    The rows added and removed are found with :func:`diff_rows`. Only the
+    added rows are cleaned, the removed rows are dropped from the cleaned
+    dataset, and both profiles are updated with the changed rows.
+
+    Args:
+        state (DatasetVersion): The loaded version, updated in place.
+        df (pd.DataFrame): The raw new version.
+        name (str): File name of the new version.
+
+    Returns:
+        VersionDiff: The rows changed, or None if ``df`` is not a version of
+        the loaded dataset.
+    """
+    if lineage_key(name, df.columns) != state.lineage:
+        return None
+
+    new_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    added, removed, unseen, vanished = diff_rows(state.raw_hashes, new_hashes)
+    state.raw_profile.update(df[added], state.raw[removed], df)
+
+    if state.cleaned is not None:
+        new_dedup_hashes = dedup_hashes(df, state.plan, new_hashes)
+        if new_dedup_hashes is new_hashes:
+            # Cleaned rows are the first occurrence of each row hash
+            dropped = pd.Series(state.cleaned_hashes).isin(vanished).to_numpy()
+            candidates = np.flatnonzero(unseen)
+        else:
+            dropped = ~pd.Series(state.cleaned_hashes).isin(new_dedup_hashes).to_numpy()
+            candidates = np.flatnonzero(
+                ~pd.Series(new_dedup_hashes).isin(state.cleaned_hashes).to_numpy()
+            )
+        appended = candidates[
+            ~pd.Series(new_dedup_hashes[candidates]).duplicated().to_numpy()
+        ]
+
+        added_cleaned, _ = apply_cleaning_plan(df.iloc[appended], state.plan)
+        removed_cleaned = state.cleaned[dropped]
+        state.cleaned = pd.concat(
+            [state.cleaned[~dropped], added_cleaned], ignore_index=True
+        )
+        state.cleaned_hashes = np.concatenate(
+            [state.cleaned_hashes[~dropped], new_dedup_hashes[appended]]
+        )
+        state.cleaned_profile.update(added_cleaned, removed_cleaned, state.cleaned)
+
+    state.raw = df
+    state.raw_hashes = new_hashes
+    state.version += 1
+
+    diff = VersionDiff(
+        added=int(added.sum()),
+        removed=int(removed.sum()),
+        unchanged=int(len(df) - added.sum()),
+    )
+    logger.info(
+        f"Dataset version {state.version}: {diff.added} rows added, {diff.removed} removed"
+    )
+    return diff
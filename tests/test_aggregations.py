@@ -0,0 +1,194 @@
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+from data_viz.aggregations import AggregationCache, Aggregations, dataset_fingerprint
+from data_viz.code_analysis import modifies_dataset
+from data_viz.pipeline import execute_code
+
+
+class TestDatasetFingerprint(unittest.TestCase):
+    """
+    Tests for fingerprinting the content of a dataset.
+    """
+
+    def test_same_content_same_fingerprint(self):
+        """Test that equal datasets share a fingerprint and changed values do not."""
+        df = pd.DataFrame({"city": ["Paris", "Tunis"], "price": [1.0, 2.0]})
+
+        self.assertEqual(dataset_fingerprint(df), dataset_fingerprint(df.copy()))
+        self.assertNotEqual(
+            dataset_fingerprint(df), dataset_fingerprint(df.assign(price=[1.0, 3.0]))
+        )
+        self.assertNotEqual(
+            dataset_fingerprint(df), dataset_fingerprint(df.rename(columns={"price": "cost"}))
+        )
+
+    def test_unhashable_values(self):
+        """Test that datasets holding unhashable values have no fingerprint."""
+        self.assertIsNone(dataset_fingerprint(pd.DataFrame({"tags": [["a"], ["b"]]})))
+
+
+class TestAggregations(unittest.TestCase):
+    """
+    Tests for the memoized aggregation helpers.
+    """
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "city": ["Paris", "Tunis", "Paris", "Paris"],
+                "price": [1.0, 2.0, 3.0, 5.0],
+                "day": pd.to_datetime(["2025-01-01", "2025-01-01", "2025-01-02", "2025-01-09"]),
+            }
+        )
+        self.cache = AggregationCache()
+        self.aggregations = Aggregations(self.df, self.cache)
+
+    def test_results(self):
+        """Test that the helpers return the pandas aggregations as DataFrames."""
+        counts = self.aggregations.count_values(self.df, "city")
+        means = self.aggregations.aggregate(self.df, "city", "price")
+        weekly = self.aggregations.resample(self.df, "day", "W", "price")
+
+        self.assertEqual(counts.values.tolist(), [["Paris", 3], ["Tunis", 1]])
+        self.assertEqual(means.values.tolist(), [["Paris", 3.0], ["Tunis", 2.0]])
+        self.assertEqual(weekly["price"].tolist(), [6.0, 5.0])
+        self.assertEqual(list(self.aggregations.aggregate(self.df, ["city"]).columns), ["city", "count"])
+
+    def test_results_reused(self):
+        """Test that follow-up calls, from any helpers bound to equal data, reuse the result."""
+        first = self.aggregations.aggregate(self.df, "city", "price", "sum")
+        other = Aggregations(self.df.copy(), self.cache)
+        with patch.object(pd.DataFrame, "groupby") as mock_groupby:
+            again = other.aggregate(other.df, ["city"], "price", "sum")
+
+        mock_groupby.assert_not_called()
+        pd.testing.assert_frame_equal(first, again)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_results_isolated_from_cache(self):
+        """Test that changing a returned result does not change the cached one."""
+        counts = self.aggregations.count_values(self.df, "city")
+        counts.loc[0, "count"] = 100
+        counts.columns = ["a", "b"]
+
+        self.assertEqual(self.aggregations.count_values(self.df, "city")["count"].tolist(), [3, 1])
+
+    def test_derived_frames_not_cached(self):
+        """Test that frames filtered from the dataset are aggregated without the cache."""
+        self.aggregations.count_values(self.df, "city")
+
+        counts = self.aggregations.count_values(self.df[self.df["price"] > 2], "city")
+
+        self.assertEqual(counts.values.tolist(), [["Paris", 2]])
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+
+    def test_view_shares_cache(self):
+        """Test that helpers bound to a copy of the dataset reuse its cached results."""
+        self.aggregations.count_values(self.df, "city")
+        view = self.aggregations.view()
+
+        view.count_values(view.df, "city")
+
+        self.assertIsNot(view.df, self.df)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_unsupported_aggregation(self):
+        """Test that only the documented aggregations are accepted."""
+        with self.assertRaises(ValueError):
+            self.aggregations.aggregate(self.df, "city", "price", "prod")
+
+    def test_memory_bounded(self):
+        """Test that the least recently used results are evicted past the memory limit."""
+        sizes = [
+            int(self.aggregations.count_values(self.df, column).memory_usage(deep=True).sum())
+            for column in ("city", "price")
+        ]
+        cache = AggregationCache(max_bytes=sum(sizes))
+        aggregations = Aggregations(self.df, cache)
+
+        aggregations.count_values(self.df, "city")
+        aggregations.count_values(self.df, "city", normalize=True)
+        aggregations.count_values(self.df, "city")
+        aggregations.count_values(self.df, "price")
+
+        self.assertEqual(len(cache), 2)
+        aggregations.count_values(self.df, "city")
+        self.assertEqual(cache.hits, 2)
+        aggregations.count_values(self.df, "city", normalize=True)
+        self.assertEqual(cache.hits, 2)
+
+    def test_generated_code_uses_helpers(self):
+        """Test that generated code can call the helpers without changing the dataset."""
+        code = (
+            "df['city'] = df['city'].str.upper()\n"
+            "counts = count_values(df, 'city')\n"
+            "import matplotlib.pyplot as plt\n"
+            "plt.bar(counts['city'], counts['count'])\n"
+        )
+
+        images = execute_code(code, self.df)
+
+        self.assertEqual(len(images), 1)
+        self.assertEqual(self.df["city"][0], "Paris")
+
+    def test_namespace_caches_unmodified_dataset(self):
+        """Test that results are only cached for code that does not modify `df` in place."""
+        filtered = "df = df[df['price'] > 2]\ncounts = count_values(df, 'city')"
+        modified = "df['city'] = df['city'].str.upper()\ncounts = count_values(df, 'city')"
+
+        for code, expected in (
+            ("counts = count_values(df, 'city')", [["Paris", 3], ["Tunis", 1]]),
+            (filtered, [["Paris", 2]]),
+            (modified, [["PARIS", 3], ["TUNIS", 1]]),
+        ):
+            with self.subTest(code=code):
+                namespace = self.aggregations.namespace(modifies_dataset(code))
+                exec(code, namespace)
+                self.assertEqual(namespace["counts"].values.tolist(), expected)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_modified_dataset_copied(self):
+        """Test that code modifying cells of `df` in place does not change the dataset."""
+        code = "df.loc[df['price'] > 2, 'price'] = 0\ndf.fillna(0, inplace=True)"
+
+        namespace = self.aggregations.namespace(modifies_dataset(code))
+        exec(code, namespace)
+
+        self.assertEqual(namespace["df"]["price"].tolist(), [1.0, 2.0, 0.0, 0.0])
+        self.assertEqual(self.df["price"].tolist(), [1.0, 2.0, 3.0, 5.0])
+
+
+class TestModifiesDataset(unittest.TestCase):
+    """
+    Tests for detecting generated code that modifies `df` in place.
+    """
+
+    def test_in_place_changes(self):
+        """Test that assignments, deletions and in-place methods on `df` are detected."""
+        for code in (
+            "df['a'] = 1",
+            "df.loc[df['a'] > 0, 'a'] = 0",
+            "df.columns = ['x', 'y']",
+            "df['a'] += 1",
+            "del df['a']",
+            "df.dropna(inplace=True)",
+            "df.insert(0, 'b', 1)",
+        ):
+            with self.subTest(code=code):
+                self.assertTrue(modifies_dataset(code))
+
+    def test_rebinding_and_reading(self):
+        """Test that rebinding `df` or reading from it is not a modification."""
+        for code in (
+            "df = df[df['a'] > 0]",
+            "counts = df['a'].value_counts()",
+            "other = df.copy()\nother['a'] = 1",
+            "df.sort_values('a', inplace=False)",
+        ):
+            with self.subTest(code=code):
+                self.assertFalse(modifies_dataset(code))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+from data_viz.utils import (  # noqa: E402
+    FIGURE_LOCK,
+    capture_figures,
+    install_figure_lock,
+    run_generated_code,
+)
+
+
+class TestCaptureFigures(unittest.TestCase):
+    def tearDown(self):
+        plt.close("all")
+
+    def test_matplotlib_figures_encoded(self):
+        """Test that open matplotlib figures are returned as PNG bytes."""
+        plt.figure()
+        plt.plot([1, 2, 3])
+        plt.figure()
+        plt.bar(["a", "b"], [1, 2])
+
+        images = capture_figures({})
+
+        self.assertEqual(len(images), 2)
+        self.assertTrue(all(image.startswith(b"\x89PNG") for image in images))
+
+    def test_plotly_export_errors_reported(self):
+        """Test that Plotly figures that cannot be exported are reported, not stored."""
+        import plotly.graph_objects as go
+
+        export_errors = []
+        with patch.object(go.Figure, "to_image", side_effect=ValueError("kaleido missing")):
+            images = capture_figures({"fig": go.Figure()}, export_errors)
+
+        self.assertEqual(images, [])
+        self.assertEqual([str(error) for error in export_errors], ["kaleido missing"])
+
+    def test_figures_closed_after_capture(self):
+        """Test that captured figures do not leak into the next run."""
+        plt.figure()
+        plt.plot([1, 2, 3])
+
+        capture_figures({})
+
+        self.assertEqual(plt.get_fignums(), [])
+        self.assertEqual(capture_figures({}), [])
+
+    def test_close_waits_for_figure_lock(self):
+        """Test that another session closing all figures waits until they are captured."""
+        self.assertFalse(getattr(plt.close, "waits_for_figure_lock", False))
+        self.addCleanup(setattr, plt, "close", plt.close)
+        install_figure_lock()
+        install_figure_lock()
+
+        with FIGURE_LOCK:
+            plt.figure()
+            plt.plot([1, 2, 3])
+            other_session = threading.Thread(target=plt.close, args=("all",))
+            other_session.start()
+            other_session.join(timeout=0.2)
+
+            images = capture_figures({})
+
+        other_session.join()
+        self.assertEqual(len(images), 1)
+
+    def test_preparation_runs_without_figure_lock(self):
+        """Test that generated code only holds the figure lock once it uses pyplot."""
+
+        def lock_free():
+            results = []
+
+            def try_lock():
+                results.append(FIGURE_LOCK.acquire(blocking=False))
+                if results[0]:
+                    FIGURE_LOCK.release()
+
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return results[0]
+
+        code = "free_before = lock_free()\nplt.figure()\nplt.plot([1, 2])\nfree_during = lock_free()"
+        namespace = {"plt": plt, "lock_free": lock_free}
+
+        images = run_generated_code(code, namespace)
+
+        self.assertTrue(namespace["free_before"])
+        self.assertFalse(namespace["free_during"])
+        self.assertEqual(len(images), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from data_viz.cleaning import (
+    CleaningPlan,
+    SeenHashes,
+    apply_cleaning_plan,
+    clean,
+    fit_cleaning_plan,
+    stream_cleaning_plan,
+)
+
+
+class TestCleaningPlan(unittest.TestCase):
+    """
+    Tests for fitting cleaning plans and replaying them on new data.
+    """
+
+    def setUp(self):
+        self.reference = pd.DataFrame(
+            {
+                "First Name": [" Alice", "Bob ", " Alice", None, "Carol"],
+                "Age": [25, None, 25, 40, 31],
+                "Score!": [1.5, 2.5, 1.5, None, 3.5],
+            }
+        )
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_fit_plan(self):
+        """Test the rules derived from the reference dataset."""
+        plan = fit_cleaning_plan(self.reference)
+
+        self.assertEqual(
+            plan.renames,
+            {"First Name": "first_name", "Age": "age", "Score!": "score"},
+        )
+        self.assertEqual(plan.dedup_columns, ["first_name", "age", "score"])
+        self.assertEqual(plan.fill_values, {"first_name": " Alice", "age": 31.0, "score": 2.5})
+        self.assertEqual(plan.strip_columns, ["first_name"])
+
+    def test_apply_matches_clean(self):
+        """Test that replaying a plan on its reference gives the same result as clean."""
+        expected, expected_report = clean(self.reference)
+
+        cleaned, report = apply_cleaning_plan(self.reference, fit_cleaning_plan(self.reference))
+
+        pd.testing.assert_frame_equal(cleaned, expected)
+        self.assertEqual(report, expected_report)
+
+    def test_apply_missing_column(self):
+        """Test that files with another schema are rejected."""
+        plan = fit_cleaning_plan(self.reference)
+
+        with self.assertRaises(ValueError):
+            apply_cleaning_plan(self.reference.drop(columns="Age"), plan)
+
+    def test_save_and_load(self):
+        """Test that a plan survives a JSON round-trip."""
+        plan = fit_cleaning_plan(self.reference)
+        path = self.directory / "plan.json"
+
+        plan.save(path)
+
+        self.assertEqual(CleaningPlan.load(path), plan)
+
+    def test_stream_deduplicates_across_chunks(self):
+        """Test that streaming in chunks gives the same rows as cleaning at once."""
+        plan = fit_cleaning_plan(self.reference)
+        new_data = pd.concat([self.reference, self.reference.iloc[::-1]], ignore_index=True)
+        source = self.directory / "today.csv"
+        output = self.directory / "today_cleaned.csv"
+        new_data.to_csv(source, index=False)
+
+        report = stream_cleaning_plan(source, plan, output, chunksize=2)
+
+        expected, _ = apply_cleaning_plan(pd.read_csv(source), plan)
+        pd.testing.assert_frame_equal(pd.read_csv(output), expected.reset_index(drop=True))
+        self.assertEqual(report.duplicates_removed, 6)
+        self.assertEqual(report.filled_missing, {"first_name": 1, "age": 1, "score": 1})
+
+
+
+class TestSeenHashes(unittest.TestCase):
+    """
+    Tests for the sorted hashes of the rows kept from previous chunks.
+    """
+
+    def test_lookup(self):
+        """Test that added hashes are found, whatever their order and magnitude."""
+        seen = SeenHashes()
+        self.assertFalse(seen.contains(np.array([1], dtype="uint64")).any())
+
+        seen.add(np.array([2**64 - 1, 7], dtype="uint64"))
+        seen.add(np.array([3], dtype="uint64"))
+
+        lookup = np.array([3, 5, 2**64 - 1, 8, 7], dtype="uint64")
+        self.assertEqual(seen.contains(lookup).tolist(), [True, False, True, False, True])
+        self.assertEqual(seen.values.tolist(), [3, 7, 2**64 - 1])
+        self.assertEqual(len(seen), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+import unittest
+from unittest.mock import patch
+
+import matplotlib
+
+matplotlib.use("Agg")
+import pandas as pd  # noqa: E402
+from data_viz.code_analysis import (  # noqa: E402
+    MAX_PLOT_POINTS,
+    analyze_code,
+    prepare_generated_code,
+    split_plotting_code,
+)
+
+LARGE = MAX_PLOT_POINTS * 10
+
+
+class TestAnalyzeCode(unittest.TestCase):
+    """
+    Tests for the static analysis of generated visualization code.
+    """
+
+    def kinds(self, code, n_rows=100):
+        return [issue.kind for issue in analyze_code(code, n_rows).issues]
+
+    def test_clean_code_unchanged(self):
+        """Test that vectorized code is returned as is."""
+        code = "counts = df['city'].value_counts()\ncounts.plot(kind='bar')"
+
+        analysis = analyze_code(code, LARGE)
+
+        self.assertEqual(analysis.code, code)
+        self.assertEqual(analysis.issues, [])
+
+    def test_names_containing_df_untouched(self):
+        """Test that only the df name is treated as the dataset."""
+        code = "pdf = df_grouped = 1\nprint('df')"
+
+        self.assertEqual(analyze_code(code, LARGE).code, code)
+
+    def test_row_iteration(self):
+        """Test detection of iterrows and itertuples."""
+        self.assertEqual(
+            self.kinds("for i, row in df.iterrows():\n    pass"), ["row_iteration"]
+        )
+        self.assertEqual(self.kinds("rows = list(df.itertuples())"), ["row_iteration"])
+
+    def test_row_apply(self):
+        """Test detection of row-wise apply, but not of column-wise apply."""
+        self.assertEqual(
+            self.kinds("df['t'] = df.apply(lambda r: r.a + r.b, axis=1)"), ["row_apply"]
+        )
+        self.assertEqual(self.kinds("df['t'] = df['a'].apply(str)"), [])
+
+    def test_python_loops(self):
+        """Test detection of loops over rows, but not over columns."""
+        self.assertEqual(
+            self.kinds("for i in range(len(df)):\n    x = df.loc[i, 'a']"), ["python_loop"]
+        )
+        self.assertEqual(self.kinds("total = [v * 2 for v in df['a']]"), ["python_loop"])
+        self.assertEqual(self.kinds("for column in df.columns:\n    print(column)"), [])
+        self.assertEqual(self.kinds("for column in df[['a', 'b']]:\n    print(column)"), [])
+        for code in (
+            "for i in range(len(df.columns)):\n    print(df.columns[i])",
+            "for i in range(len(df['a'].unique())):\n    print(i)",
+        ):
+            with self.subTest(code=code):
+                self.assertEqual(self.kinds(code), [])
+        self.assertEqual(
+            self.kinds("for i in range(1, len(df['a'])):\n    x = df['a'][i]"), ["python_loop"]
+        )
+
+    def test_df_redefinition_removed(self):
+        """Test that reading the data again is removed, but deriving it is kept."""
+        code = "import pandas as pd\ndf = pd.read_csv('data.csv')\ndf = df[df['a'] > 0]"
+
+        analysis = analyze_code(code, 100)
+
+        self.assertEqual([issue.kind for issue in analysis.issues], ["df_redefinition"])
+        self.assertEqual(analysis.code, "import pandas as pd\ndf = df[df['a'] > 0]")
+
+    def test_example_data_removed(self):
+        """Test that example data built from literals is removed."""
+        code = "df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})\nprint(df)"
+
+        self.assertEqual(analyze_code(code, 100).code, "print(df)")
+
+    def test_df_derived_from_other_name_kept(self):
+        """Test that `df` assigned from a name derived from the dataset, or a helper, is kept."""
+        for code in (
+            "filtered = df[df['a'] > 0]\ndf = filtered",
+            "df = count_values(other, 'city')",
+            "df = pd.DataFrame({'a': df['a'] * 2})",
+        ):
+            with self.subTest(code=code):
+                analysis = analyze_code(code, 100)
+                self.assertEqual(analysis.issues, [])
+                self.assertEqual(analysis.code, code)
+
+    def test_unbounded_plot_sampled(self):
+        """Test that scatter plots of large datasets draw a sample."""
+        code = "import matplotlib.pyplot as plt\nplt.scatter(df['a'], df['b'])"
+
+        analysis = analyze_code(code, LARGE)
+
+        self.assertEqual([issue.kind for issue in analysis.issues], ["unbounded_plot"])
+        self.assertIn("plt.scatter(df_sample['a'], df_sample['b'])", analysis.code)
+
+        namespace = {"df": pd.DataFrame({"a": range(LARGE), "b": range(LARGE)})}
+        exec(analysis.code, namespace)
+        self.assertEqual(len(namespace["df_sample"]), MAX_PLOT_POINTS)
+        self.assertTrue(namespace["df_sample"].index.is_monotonic_increasing)
+        namespace["plt"].close("all")
+
+    def test_small_plots_not_sampled(self):
+        """Test that plots of small datasets are left alone."""
+        self.assertEqual(self.kinds("sns.scatterplot(data=df, x='a', y='b')"), [])
+        self.assertEqual(
+            self.kinds("sns.scatterplot(data=df, x='a', y='b')", LARGE), ["unbounded_plot"]
+        )
+
+    def test_aggregated_plots_not_sampled(self):
+        """Test that plots of aggregated data are left alone."""
+        self.assertEqual(
+            self.kinds("df.groupby('a')['b'].mean().plot(kind='bar')", LARGE), []
+        )
+
+    def test_summarizing_plots_not_sampled(self):
+        """Test that plots summarizing every row, such as histograms, are left alone."""
+        for code in (
+            "df['price'].plot(kind='hist')",
+            "df.plot(kind='box')",
+            "df['price'].plot.hist(bins=50)",
+            "sns.lineplot(data=df, x='a', y='b')",
+            "sns.histplot(df['price'])",
+        ):
+            with self.subTest(code=code):
+                self.assertEqual(self.kinds(code, LARGE), [])
+
+    def test_point_plot_kinds_sampled(self):
+        """Test that line and scatter kinds of `.plot` draw a sample."""
+        for code in (
+            "df.plot(x='a', y='b')",
+            "df.plot(x='a', y='b', kind='scatter')",
+            "df.plot.line(x='a', y='b')",
+            "px.line(df, x='a', y='b')",
+        ):
+            with self.subTest(code=code):
+                self.assertEqual(self.kinds(code, LARGE), ["unbounded_plot"])
+
+    def test_split_before_plotting(self):
+        """Test that the data preparation is split from the code using pyplot."""
+        code = (
+            "import matplotlib.pyplot as plt\n"
+            "counts = df['a'].value_counts()\n"
+            "counts = counts.head(5)\n"
+            "counts.plot(kind='bar')\n"
+            "plt.title('Counts')\n"
+        )
+
+        preparation, plotting = split_plotting_code(code)
+
+        self.assertEqual(
+            preparation,
+            "import matplotlib.pyplot as plt\ncounts = df['a'].value_counts()\ncounts = counts.head(5)\n",
+        )
+        self.assertEqual(plotting, "\n\n\ncounts.plot(kind='bar')\nplt.title('Counts')\n")
+
+    def test_split_with_import_aliases(self):
+        """Test that pyplot is recognized under any name the code imports it as."""
+        for code in (
+            "import seaborn as sb\ncounts = df['a'].value_counts()\nsb.histplot(df['a'])",
+            "from matplotlib import pyplot as p\ncounts = df['a'].value_counts()\np.bar(counts.index, counts)",
+            "from matplotlib.pyplot import subplots\ncounts = df['a'].value_counts()\nfig, ax = subplots()",
+            "import importlib\ncounts = df['a'].value_counts()\nm = importlib.import_module('seaborn')",
+        ):
+            with self.subTest(code=code):
+                preparation, plotting = split_plotting_code(code)
+                self.assertIn("value_counts", preparation)
+                self.assertEqual(plotting.strip(), code.splitlines()[-1])
+
+    def test_split_at_star_import(self):
+        """Test that code after a star import from a plotting module is all plotting code."""
+        code = "counts = df['a'].value_counts()\nfrom seaborn import *\nhistplot(df['a'])"
+
+        preparation, plotting = split_plotting_code(code)
+
+        self.assertEqual(preparation, "counts = df['a'].value_counts()\n")
+        self.assertEqual(plotting, "\nfrom seaborn import *\nhistplot(df['a'])")
+
+    def test_split_without_plotting(self):
+        """Test that code not using pyplot, such as plotly code, is all preparation."""
+        code = "import plotly.express as px\nfig = px.bar(df, x='a')"
+
+        self.assertEqual(split_plotting_code(code), (code, ""))
+
+
+class TestPrepareGeneratedCode(unittest.TestCase):
+    @patch("data_viz.code_analysis.call_llm_for_vectorized_code")
+    def test_row_wise_code_vectorized(self, mock_llm):
+        """Test that row-wise code on large datasets is sent back to the LLM."""
+        mock_llm.return_value = "```python\ndf['t'] = df['a'] + df['b']\n```"
+
+        analysis = prepare_generated_code(
+            "df['t'] = df.apply(lambda r: r.a + r.b, axis=1)", LARGE, API_KEY="key"
+        )
+
+        mock_llm.assert_called_once()
+        self.assertTrue(analysis.vectorized)
+        self.assertEqual(analysis.code, "df['t'] = df['a'] + df['b']")
+        self.assertEqual(analysis.issues, [])
+
+    @patch("data_viz.code_analysis.call_llm_for_vectorized_code")
+    def test_llm_error_keeps_original(self, mock_llm):
+        """Test that the original code runs when the vectorization request fails."""
+        mock_llm.side_effect = ConnectionError("rate limited")
+        code = "df['t'] = df.apply(lambda r: r.a + r.b, axis=1)"
+
+        analysis = prepare_generated_code(code, LARGE, API_KEY="key")
+
+        self.assertFalse(analysis.vectorized)
+        self.assertEqual(analysis.code, code)
+        self.assertEqual([issue.kind for issue in analysis.issues], ["row_apply"])
+
+    @patch("data_viz.code_analysis.call_llm_for_vectorized_code")
+    def test_small_dataset_not_vectorized(self, mock_llm):
+        """Test that row-wise code on small datasets runs as is."""
+        analysis = prepare_generated_code(
+            "df['t'] = df.apply(lambda r: r.a + r.b, axis=1)", 100, API_KEY="key"
+        )
+
+        mock_llm.assert_not_called()
+        self.assertFalse(analysis.vectorized)
+
+
+if __name__ == "__main__":
+    unittest.main()
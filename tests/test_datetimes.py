@@ -0,0 +1,121 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+from data_viz.cleaning import CleaningPlan, fit_cleaning_plan, stream_cleaning_plan
+from data_viz.datetimes import detect_datetime_format, parse_datetime_columns
+from data_viz.pipeline import ingest
+
+
+class TestDetectDatetimeFormat(unittest.TestCase):
+    """
+    Tests for inferring the format of date columns from a sample.
+    """
+
+    def test_iso_dates(self):
+        """Test that ISO dates and timestamps are detected."""
+        self.assertEqual(detect_datetime_format(pd.Series(["2025-01-02", "2025-01-13"])), "%Y-%m-%d")
+        self.assertEqual(
+            detect_datetime_format(pd.Series(["2025-01-02 10:11:12", None])), "%Y-%m-%d %H:%M:%S"
+        )
+
+    def test_day_first_dates(self):
+        """Test that day-first dates are detected from the values that rule out month-first."""
+        series = pd.Series(["01/02/2025", "05/03/2025", "13/02/2025", "28/02/2025"])
+
+        self.assertEqual(detect_datetime_format(series), "%d/%m/%Y")
+
+    def test_non_dates(self):
+        """Test that text, numbers and years alone are not detected as dates."""
+        self.assertIsNone(detect_datetime_format(pd.Series(["Paris", "Tunis"])))
+        self.assertIsNone(detect_datetime_format(pd.Series(["2021", "2022"])))
+        self.assertIsNone(detect_datetime_format(pd.Series([20250102, 20250103])))
+        self.assertIsNone(detect_datetime_format(pd.Series([None, None], dtype=object)))
+
+
+class TestParseDatetimeColumns(unittest.TestCase):
+    """
+    Tests for parsing the date columns of a dataset.
+    """
+
+    def test_parsed_to_datetime64(self):
+        """Test that date columns are parsed and their formats recorded."""
+        df = pd.DataFrame(
+            {"day": ["02/01/2025", "03/01/2025", None], "city": ["Paris", "Tunis", "Paris"]}
+        )
+
+        parsed = parse_datetime_columns(df)
+
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(parsed["day"]))
+        self.assertEqual(parsed["day"][1], pd.Timestamp("2025-03-01"))
+        self.assertTrue(pd.isna(parsed["day"][2]))
+        self.assertEqual(parsed.attrs["datetime_formats"], {"day": "%m/%d/%Y"})
+        self.assertFalse(pd.api.types.is_datetime64_any_dtype(df["day"]))
+
+    def test_repeated_values_parsed_once(self):
+        """Test that columns with repeated dates are parsed like every value separately."""
+        dates = pd.Series(["13/02/2025", "14/02/2025", None] * 2000, name="day")
+
+        parsed = parse_datetime_columns(pd.DataFrame({"day": dates}))["day"]
+
+        pd.testing.assert_series_equal(
+            parsed, pd.to_datetime(dates, format="%d/%m/%Y"), check_dtype=False
+        )
+
+    def test_values_outside_sample_keep_column(self):
+        """Test that a column is left as is when values outside the sample do not parse."""
+        dates = pd.Series(["2025-01-02"] * 5000 + ["unknown"])
+
+        parsed = parse_datetime_columns(pd.DataFrame({"day": dates}))
+
+        self.assertFalse(pd.api.types.is_datetime64_any_dtype(parsed["day"]))
+        self.assertEqual(parsed.attrs["datetime_formats"], {})
+
+    def test_known_formats_coerce(self):
+        """Test that values not matching a known format become NaT."""
+        df = pd.DataFrame({"day": ["2025-01-02", "unknown"]})
+
+        parsed = parse_datetime_columns(df, {"day": "%Y-%m-%d"})
+
+        self.assertTrue(pd.isna(parsed["day"][1]))
+
+    def test_ingest_parses_dates(self):
+        """Test that CSV files are ingested with native timestamps."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "sales.csv"
+            path.write_text("date,amount\n2025-01-02,10\n2025-01-03,12\n")
+
+            df = ingest(path)
+
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["date"]))
+
+
+class TestCleaningPlanDates(unittest.TestCase):
+    """
+    Tests for replaying the date formats of a cleaning plan.
+    """
+
+    def test_plan_parses_streamed_chunks(self):
+        """Test that a saved plan parses the dates of raw CSV chunks and fills them with dates."""
+        reference = parse_datetime_columns(
+            pd.DataFrame({"Day": ["02/01/2025", "02/01/2025", "03/01/2025"], "n": [1, 2, 3]})
+        )
+        plan = fit_cleaning_plan(reference)
+        self.assertEqual(plan.datetime_formats, {"Day": "%m/%d/%Y"})
+
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            plan.save(directory / "plan.json")
+            (directory / "new.csv").write_text("Day,n\n04/01/2025,4\n,5\n")
+
+            stream_cleaning_plan(
+                directory / "new.csv", CleaningPlan.load(directory / "plan.json"), directory / "out.csv"
+            )
+            cleaned = pd.read_csv(directory / "out.csv")
+
+        self.assertEqual(cleaned["day"].tolist(), ["2025-04-01", "2025-02-01"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+import zipfile
+from io import BytesIO
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from data_viz.pipeline import UnsupportedFileFormatError, ingest, ingest_many, reconcile_schemas
+from data_viz.utils import read_uploaded_file
+
+
+def upload(name, content):
+    file = BytesIO(content)
+    file.name = name
+    return file
+
+
+def zip_archive(files):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+class TestIngestMany(unittest.TestCase):
+    """
+    Tests for reading several files, or zip archives of them, as one dataset.
+    """
+
+    def test_files_concatenated_in_order(self):
+        """Test that files are concatenated in order with their columns matched by name."""
+        df = ingest_many(
+            [BytesIO(b"city,price\nParis,1\n"), BytesIO(b"price,city,rooms\n2.5,Tunis,3\n")],
+            ["a.csv", "b.csv"],
+        )
+
+        self.assertEqual(list(df.columns), ["city", "price", "rooms"])
+        self.assertEqual(df["city"].tolist(), ["Paris", "Tunis"])
+        self.assertEqual(df["price"].tolist(), [1.0, 2.5])
+        self.assertEqual(list(df.index), [0, 1])
+
+    def test_zip_archive(self):
+        """Test that the table files of a zip archive are read sorted by name."""
+        archive = zip_archive(
+            {
+                "sales/2.csv": "day,n\n2025-01-03,2\n",
+                "sales/1.csv": "day,n\n2025-01-02,1\n",
+                "__MACOSX/sales/._1.csv": "metadata",
+                "README.txt": "notes",
+            }
+        )
+
+        df = ingest(archive, "sales.zip")
+
+        self.assertEqual(df["n"].tolist(), [1, 2])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["day"]))
+        self.assertEqual(df.attrs["datetime_formats"], {"day": "%Y-%m-%d"})
+
+    def test_zip_without_tables(self):
+        """Test that an archive without CSV or Excel files is rejected."""
+        with self.assertRaises(UnsupportedFileFormatError):
+            ingest(zip_archive({"README.txt": "notes"}), "notes.zip")
+
+    def test_unsupported_file(self):
+        """Test that a single unsupported file rejects the whole dataset."""
+        with self.assertRaises(UnsupportedFileFormatError):
+            ingest_many([BytesIO(b"a\n1\n"), BytesIO(b"notes")], ["a.csv", "notes.txt"])
+
+
+class TestReconcileSchemas(unittest.TestCase):
+    """
+    Tests for giving each column the same dtype in every part of a dataset.
+    """
+
+    def test_dates_detected_in_some_files(self):
+        """Test that dates left as strings in one file are parsed with the format of the others."""
+        parts = [
+            pd.DataFrame({"day": pd.to_datetime(["2025-01-02"])}),
+            pd.DataFrame({"day": ["2025-01-03", None]}),
+        ]
+        parts[0].attrs["datetime_formats"] = {"day": "%Y-%m-%d"}
+
+        reconciled = reconcile_schemas(parts)
+
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(reconciled[1]["day"]))
+        self.assertFalse(pd.api.types.is_datetime64_any_dtype(parts[1]["day"]))
+
+    def test_dates_kept_in_source_format(self):
+        """Test that dates are written back in their source format when a file holds other text."""
+        parts = [
+            pd.DataFrame({"day": pd.to_datetime(["02/01/2025", None], format="%d/%m/%Y")}),
+            pd.DataFrame({"day": ["03/01/2025", "unknown"]}),
+        ]
+        parts[0].attrs["datetime_formats"] = {"day": "%d/%m/%Y"}
+
+        reconciled = reconcile_schemas(parts)
+
+        self.assertEqual(reconciled[0]["day"].tolist()[0], "02/01/2025")
+        self.assertTrue(pd.isna(reconciled[0]["day"][1]))
+        self.assertEqual(reconciled[1]["day"].tolist(), ["03/01/2025", "unknown"])
+
+    def test_numbers_read_as_text(self):
+        """Test that numbers read as text are converted, unless a value would be lost."""
+        numbers = pd.DataFrame({"n": [1, 2]})
+
+        converted = reconcile_schemas([numbers, pd.DataFrame({"n": ["3", "4"]})])
+        kept = reconcile_schemas([numbers, pd.DataFrame({"n": ["3", "1,000"]})])
+
+        self.assertTrue(pd.api.types.is_integer_dtype(converted[1]["n"]))
+        self.assertEqual(kept[0]["n"].tolist(), ["1", "2"])
+        self.assertEqual(kept[1]["n"].tolist(), ["3", "1,000"])
+
+    def test_empty_column_takes_dtype(self):
+        """Test that a column without values in one file takes the dtype of the others."""
+        parts = [pd.DataFrame({"note": [None, None]}), pd.DataFrame({"note": ["a", None]})]
+
+        reconciled = reconcile_schemas(parts)
+
+        self.assertEqual(reconciled[0]["note"].dtype, parts[1]["note"].dtype)
+
+    def test_unchanged_columns_shared(self):
+        """Test that columns with a common dtype are not copied."""
+        parts = [pd.DataFrame({"n": [1.0]}), pd.DataFrame({"n": [2.0]})]
+
+        reconciled = reconcile_schemas(parts)
+
+        self.assertTrue(np.shares_memory(reconciled[0]["n"].values, parts[0]["n"].values))
+
+
+class TestReadUploadedFiles(unittest.TestCase):
+    """
+    Tests for reading several uploaded files with `read_uploaded_file`.
+    """
+
+    def test_uploaded_files(self):
+        """Test that a list of uploaded files is read as one dataset."""
+        files = [upload("a.csv", b"n\n1\n"), upload("b.zip", zip_archive({"b.csv": "n\n2\n"}).read())]
+
+        df = read_uploaded_file(files)
+
+        self.assertEqual(df["n"].tolist(), [1, 2])
+
+    @patch("streamlit.error")
+    def test_invalid_file_reported(self, mock_st_error):
+        """Test that an unsupported file among the uploads is reported."""
+        result = read_uploaded_file([upload("a.csv", b"n\n1\n"), upload("b.txt", b"notes")])
+
+        self.assertIsNone(result)
+        mock_st_error.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+from data_viz.pipeline import (
+    UnsupportedFileFormatError,
+    clean,
+    extract_python_code,
+    ingest,
+    main,
+    profile,
+    run_batch,
+    run_pipeline,
+)
+
+
+class TestPipeline(unittest.TestCase):
+    """
+    Tests for the headless pipeline stages, which must not depend on Streamlit.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+        for index in range(3):
+            pd.DataFrame(
+                {"First Name": ["Alice", "Bob", "Alice", None], "Age": [25, None, 25, 40]}
+            ).to_csv(self.directory / f"data_{index}.csv", index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_ingest_unsupported_format(self):
+        """Test that unsupported files raise instead of reporting to the UI."""
+        with self.assertRaises(UnsupportedFileFormatError):
+            ingest("data.txt")
+
+    def test_clean_report(self):
+        """Test that cleaning returns a structured report of its changes."""
+        df = ingest(self.directory / "data_0.csv")
+
+        cleaned_df, report = clean(df)
+
+        self.assertEqual(list(cleaned_df.columns), ["first_name", "age"])
+        self.assertEqual(report.renamed_columns, {"First Name": "first_name", "Age": "age"})
+        self.assertEqual(report.duplicates_removed, 1)
+        self.assertEqual(report.filled_missing, {"first_name": 1, "age": 1})
+
+    def test_profile(self):
+        """Test the dataset profile."""
+        df = pd.DataFrame({"a": [1, 2, None], "b": ["x", "y", "z"]})
+
+        result = profile(df)
+
+        self.assertEqual(result["rows"], 3)
+        self.assertEqual(result["columns"], 2)
+        self.assertEqual(result["missing"], {"a": 1, "b": 0})
+        self.assertEqual(result["summary"]["a"]["count"], 2)
+
+    def test_extract_python_code(self):
+        """Test code extraction with and without a python block."""
+        self.assertEqual(
+            extract_python_code("Here:\n```python\nprint(df)\n```"), "print(df)"
+        )
+        self.assertEqual(extract_python_code("print(df)"), "print(df)")
+
+    def test_run_pipeline_without_request(self):
+        """Test that the LLM stages are skipped when no request is given."""
+        report = run_pipeline(self.directory / "data_0.csv")
+
+        self.assertEqual(report.errors, [])
+        self.assertEqual(report.profile["rows"], 3)
+        self.assertIsNone(report.code)
+        self.assertEqual(set(report.timings), {"ingest", "clean", "profile"})
+
+    def test_run_pipeline_ingest_error(self):
+        """Test that a failing stage is recorded in the report."""
+        report = run_pipeline(self.directory / "missing.csv")
+
+        self.assertEqual(len(report.errors), 1)
+        self.assertTrue(report.errors[0].startswith("ingest:"))
+
+    def test_run_batch(self):
+        """Test running the pipeline over several datasets on a process pool."""
+        paths = sorted(self.directory.glob("*.csv"))
+
+        reports = run_batch(paths, workers=2)
+
+        self.assertEqual([report.source for report in reports], [str(path) for path in paths])
+        self.assertTrue(all(report.profile["rows"] == 3 for report in reports))
+
+    def test_cli(self):
+        """Test that the command line tool writes one report per dataset."""
+        output = self.directory / "reports"
+
+        status = main([str(self.directory), "--workers", "2", "--output", str(output)])
+
+        self.assertEqual(status, 0)
+        self.assertEqual(len(list(output.glob("*.json"))), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+from data_viz.speculation import SPECULATION_WORKERS, Speculation, _executor, suggest_requests
+
+RESPONSE = "```python\ndf['price'].plot(kind='hist')\n```"
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Speculative work did not finish in time")
+        time.sleep(0.01)
+
+
+class TestSuggestRequests(unittest.TestCase):
+    """
+    Tests for the visualization requests suggested from the column types.
+    """
+
+    def test_suggestions_follow_column_types(self):
+        """Test that histograms, bar charts and time series are suggested for matching columns."""
+        df = pd.DataFrame(
+            {
+                "city": ["Paris", "Tunis", "Paris"],
+                "date": pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-03"]),
+                "price": [1.0, 2.0, 3.0],
+            }
+        )
+
+        requests = suggest_requests(df, limit=5)
+
+        self.assertEqual(
+            requests,
+            [
+                "Show the distribution of price with a histogram",
+                "Show a bar chart of the number of rows per city",
+                "Show price over date with a line chart",
+                "Compare price across city with a box plot",
+            ],
+        )
+
+    def test_suggestions_capped(self):
+        """Test that no more suggestions than the limit are returned."""
+        df = pd.DataFrame({"a": [1, 2], "b": [3, 4], "city": ["x", "y"]})
+
+        self.assertEqual(len(suggest_requests(df, limit=2)), 2)
+
+    def test_identifiers_not_categories(self):
+        """Test that columns with many distinct values are not suggested as categories."""
+        df = pd.DataFrame({"id": [f"row-{i}" for i in range(100)]})
+
+        self.assertEqual(suggest_requests(df), [])
+
+    def test_empty_dataset(self):
+        """Test that nothing is suggested for an empty dataset."""
+        self.assertEqual(suggest_requests(pd.DataFrame()), [])
+
+
+@patch("data_viz.speculation.prepare_generated_code")
+@patch("data_viz.speculation.call_llm_for_viz", return_value=RESPONSE)
+class TestSpeculation(unittest.TestCase):
+    """
+    Tests for the background speculative work on a loaded dataset.
+    """
+
+    def setUp(self):
+        self.df = pd.DataFrame({"price": [1.0, 2.0, 3.0], "city": ["a", "b", "a"]})
+
+    def test_suggestions_generated_in_background(self, mock_llm, mock_prepare):
+        """Test that the code of each suggestion is generated without being requested."""
+        speculation = Speculation(self.df, "key", limit=2)
+        wait_until(lambda: speculation.requests and all(map(speculation.ready, speculation.requests)))
+
+        self.assertEqual(mock_llm.call_count, 2)
+        self.assertEqual(mock_prepare.call_count, 2)
+        dataset_info = mock_llm.call_args.kwargs["dataset_info"]
+        self.assertIn("price", dataset_info)
+        self.assertEqual(speculation.dataset_info(), dataset_info)
+
+    def test_lookup_matches_suggestion(self, mock_llm, mock_prepare):
+        """Test that a request matching a suggestion is served from the speculative result."""
+        speculation = Speculation(self.df, "key", limit=1)
+        wait_until(lambda: speculation.requests and speculation.ready(speculation.requests[0]))
+
+        suggestion = speculation.lookup("  SHOW the distribution of price   with a histogram")
+
+        self.assertEqual(suggestion.response, RESPONSE)
+        self.assertEqual(suggestion.analysis, mock_prepare.return_value)
+        self.assertIsNone(speculation.lookup("Show a pie chart"))
+        self.assertEqual(mock_llm.call_count, 1)
+
+    def test_failed_generation_ignored(self, mock_llm, mock_prepare):
+        """Test that a failed speculative generation falls back to a regular request."""
+        mock_llm.side_effect = RuntimeError("API error")
+        speculation = Speculation(self.df, "key", limit=1)
+        wait_until(lambda: not speculation.pending)
+
+        self.assertIsNone(speculation.lookup(speculation.requests[0]))
+
+    def test_charts_capped(self, mock_llm, mock_prepare):
+        """Test that only the first suggestions are generated when charts are capped."""
+        speculation = Speculation(self.df, "key", limit=2, charts=1)
+        wait_until(lambda: speculation.ready(speculation.requests[0]))
+
+        self.assertEqual(len(speculation.requests), 2)
+        self.assertEqual(speculation.started, 1)
+        self.assertIsNone(speculation.lookup(speculation.requests[1]))
+        self.assertEqual(mock_llm.call_count, 1)
+
+    def test_suggestions_not_queued(self, mock_llm, mock_prepare):
+        """Test that the suggestions are available while the shared pool is busy."""
+        release = threading.Event()
+        busy = [_executor.submit(release.wait, 5) for _ in range(SPECULATION_WORKERS)]
+        try:
+            speculation = Speculation(self.df, "key", limit=1)
+
+            self.assertEqual(speculation.requests, ["Show the distribution of price with a histogram"])
+            self.assertTrue(speculation.pending)
+        finally:
+            release.set()
+        wait_until(lambda: all(future.done() for future in busy) and not speculation.pending)
+        self.assertTrue(speculation.ready(speculation.requests[0]))
+
+    def test_cancel_drops_queued_work(self, mock_llm, mock_prepare):
+        """Test that cancelling a replaced dataset stops its queued generations."""
+        release = threading.Event()
+        mock_llm.side_effect = lambda *args, **kwargs: release.wait(5) and RESPONSE
+        speculation = Speculation(self.df, "key", limit=3)
+        wait_until(lambda: speculation.started)
+
+        speculation.cancel()
+        release.set()
+        wait_until(lambda: not speculation.pending)
+
+        queued = speculation.requests[-1]
+        self.assertIsNone(speculation.lookup(queued))
+        self.assertLess(mock_llm.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from data_viz.cleaning import apply_cleaning_plan
+from data_viz.versioning import (
+    RunningProfile,
+    clean_version,
+    lineage_key,
+    start_version,
+    update_version,
+)
+
+
+class TestVersioning(unittest.TestCase):
+    """
+    Tests for the incremental update of a dataset with a new version.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.yesterday = pd.DataFrame(
+            {
+                "City ": rng.choice([" Paris", "Lyon ", None], 200),
+                "Sales": rng.integers(0, 50, 200).astype("float64"),
+            }
+        )
+        self.yesterday.loc[::17, "Sales"] = np.nan
+        appended = pd.DataFrame({"City ": ["Nice", "Paris", None], "Sales": [1000.0, -5.0, np.nan]})
+        self.today = pd.concat(
+            [self.yesterday.iloc[10:], appended, self.yesterday.iloc[:2]], ignore_index=True
+        )
+
+    def assert_profile_equal(self, profile, df):
+        pd.testing.assert_frame_equal(
+            profile.describe(), RunningProfile.from_frame(df).describe(), check_exact=False
+        )
+
+    def test_lineage_key(self):
+        """Test that dated file names with the same columns share a lineage."""
+        columns = pd.Index(["a", "b"])
+        self.assertEqual(
+            lineage_key("sales_2025-01-02.csv", columns),
+            lineage_key("sales_2025-01-03.csv", columns),
+        )
+        self.assertNotEqual(
+            lineage_key("sales_2025-01-02.csv", columns),
+            lineage_key("sales_2025-01-02.csv", pd.Index(["a", "c"])),
+        )
+        self.assertNotEqual(
+            lineage_key("sales.csv", columns), lineage_key("costs.csv", columns)
+        )
+
+    def test_other_dataset_not_a_version(self):
+        """Test that an unrelated upload does not update the loaded dataset."""
+        state = start_version(self.yesterday, "sales_01.csv")
+
+        self.assertIsNone(update_version(state, self.today, "costs_02.csv"))
+        self.assertEqual(state.version, 1)
+
+    def test_diff(self):
+        """Test the rows reported as added, removed and unchanged."""
+        state = start_version(self.yesterday, "sales_01.csv")
+
+        diff = update_version(state, self.today, "sales_02.csv")
+
+        self.assertEqual(state.version, 2)
+        self.assertIs(state.raw, self.today)
+        self.assertEqual(diff.added, 3)
+        self.assertEqual(diff.removed, 8)
+        self.assertEqual(diff.unchanged, len(self.today) - 3)
+
+    def test_raw_profile_updated(self):
+        """Test that the incremental raw profile matches a full recomputation."""
+        state = start_version(self.yesterday, "sales_01.csv")
+
+        update_version(state, self.today, "sales_02.csv")
+
+        self.assert_profile_equal(state.raw_profile, self.today)
+        self.assertEqual(state.raw_profile.rows, len(self.today))
+
+    def test_profile_precise_on_large_values(self):
+        """Test that the running deviation of large values with a small spread is not lost."""
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame({"ts": 1.7e9 + rng.normal(0, 1, 1000)})
+        profile = RunningProfile.from_frame(df.iloc[:600])
+
+        profile.update(df.iloc[600:], df.iloc[:100], df.iloc[100:])
+
+        self.assertAlmostEqual(profile.describe().loc["std", "ts"], df["ts"].iloc[100:].std(), places=6)
+        self.assertAlmostEqual(profile.describe().loc["mean", "ts"], df["ts"].iloc[100:].mean(), places=6)
+
+    def test_cleaned_data_updated(self):
+        """Test that only the new rows are cleaned, with yesterday's plan."""
+        state = start_version(self.yesterday, "sales_01.csv")
+        clean_version(state)
+        plan = state.plan
+
+        update_version(state, self.today, "sales_02.csv")
+
+        self.assertIs(state.plan, plan)
+        expected, _ = apply_cleaning_plan(self.today, plan)
+        pd.testing.assert_frame_equal(
+            state.cleaned.sort_values(["city", "sales"]).reset_index(drop=True),
+            expected.sort_values(["city", "sales"]).reset_index(drop=True),
+        )
+        self.assertIn(1000.0, state.cleaned["sales"].values)
+        self.assert_profile_equal(state.cleaned_profile, state.cleaned)
+
+
+if __name__ == "__main__":
+    unittest.main()